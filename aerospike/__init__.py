@@ -1,24 +1,37 @@
 # -*- coding: utf-8 -*-
 try:
-    from .api import (load_library,
+    from .api import (load_library, add_wrappers,
                       turn_async_into_sync, rearrange_args_for_tornado)
 except ImportError:
     load_library = None
-import inspect
 try:
     import six
 except ImportError:
     six = None
-from .constants import DEFAULT_OBJECT_POOL_SIZE, DEFAULT_INITIAL_POOL_SIZE
+from .constants import (
+    DEFAULT_OBJECT_POOL_SIZE, DEFAULT_INITIAL_POOL_SIZE, DEFAULT_EVENT_LOOPS,
+    ROUTE_ROUND_ROBIN, ROUTE_BY_KEY,
+    BACKPRESSURE_BLOCK, BACKPRESSURE_RAISE, BACKPRESSURE_WOULD_BLOCK,
+    DISPATCH_INLINE, DISPATCH_THREAD_POOL, DISPATCH_QUEUE)
+from .common import BackpressureError, WOULD_BLOCK
+from .completion import (
+    InlineDispatcher, ThreadPoolDispatcher, QueueDispatcher)
+from .data_types import Key, Record
+from .aio import AsyncioClient
 from .logger import logger
-import types
 from .cli import gather_cli_options, interpreter
 
 
 def get_client(
         max_object_pool_size=DEFAULT_OBJECT_POOL_SIZE,
         initial_size=DEFAULT_INITIAL_POOL_SIZE,
-        generate_blocking=True, generate_tornado_func_style=True):
+        generate_blocking=True, generate_tornado_func_style=True,
+        wake_loop_on_submit=True, event_loops=DEFAULT_EVENT_LOOPS,
+        event_loop_routing=ROUTE_ROUND_ROBIN, max_in_flight=None,
+        in_flight_low_watermark=None,
+        backpressure_policy=BACKPRESSURE_BLOCK, object_pool_capacities=None,
+        record_results=False, completion_dispatcher=DISPATCH_INLINE,
+        coalesce_reads=False):
     '''
     Secure a client connection.
 
@@ -26,6 +39,11 @@ def get_client(
 
     if -1 or None, it will never recycle any malloc'ed object.
 
+    object_pool_capacities: Per type overrides of max_object_pool_size,
+        keyed by C type name, i.e. {'ev2citrusleaf_object *': 8192}.
+        client.object_pool_stats reports hits, misses, evictions and the
+        high water mark of every pooled type to size these by.
+
     generate_blocking: Create blocking versions of async functions
         (denoted by 'bl_' prepended to the functions async name)
 
@@ -38,6 +56,59 @@ def get_client(
         that have 't_' prepended to them, where callback is at the end.
 
         This means you can use things like get_key in a Tornado Request.
+
+    wake_loop_on_submit: Interrupt the event loop whenever work is
+        submitted so it goes out immediately. If False, submitted work waits
+        for the next network event or timer to wake the loop.
+
+    event_loops: Number of libevent event bases to run, each on its own
+        thread with its own queue. Use more than one when a single loop
+        thread is CPU bound.
+
+    event_loop_routing: How requests are spread over the event loops.
+        ROUTE_ROUND_ROBIN ('round_robin') takes turns,
+        ROUTE_BY_KEY ('key') sends every request for the same key/digest
+        to the same loop.
+
+    max_in_flight: Cap on requests awaiting their callback (None is
+        unbounded). Once reached, no new request is admitted until the
+        count falls to in_flight_low_watermark (default 3/4 of the cap).
+        client.in_flight and client.queued report the current depth.
+
+    backpressure_policy: What a request does while the cap is in effect.
+        BACKPRESSURE_BLOCK ('block') waits for room,
+        BACKPRESSURE_RAISE ('raise') raises BackpressureError,
+        BACKPRESSURE_WOULD_BLOCK ('would_block') makes the call return
+        WOULD_BLOCK without submitting anything.
+
+    record_results: Call back with a Record (bins, generation,
+        expiration; read like a dict) in place of the bins dict. Cheaper
+        to make than the dict, which it only builds if asked to.
+
+    completion_dispatcher: Where callbacks run.
+        DISPATCH_INLINE ('inline') on the event loop thread as soon as the
+        request completes; a slow callback holds up every other request
+        on that loop.
+        DISPATCH_THREAD_POOL ('thread_pool') on DEFAULT_DISPATCH_WORKERS
+        worker threads.
+        DISPATCH_QUEUE ('queue') wherever the application calls
+        client.completion_dispatcher.drain(), in bulk.
+        Or pass a dispatcher (see InlineDispatcher) of your own.
+        The event loop always decodes results and releases C objects
+        itself; bl_ calls are woken up from it directly.
+
+    coalesce_reads: get_key/get_digest calls for a record that another
+        one is already reading wait for (and share) that one's result
+        rather than sending their own request. Each gets bins (dict or
+        Record) of its own, but the first caller's timeout_ms stands for
+        all of them.
+        A coalesced read can be stale: it gets whatever the read it
+        joined found, and that read may have been sent before a write
+        that has since completed. Writes made through this client (by
+        the same key form, i.e. put_key for get_key, put_digest for
+        get_digest) end the sharing once they call back, so a read issued
+        after that never joins an older one. Writes by anyone else, or
+        through the other key form, go unnoticed.
     '''
     if not load_library:
         raise ImportError("Unable to import api!")
@@ -46,24 +117,21 @@ def get_client(
         initial_size = 0
     if not six:
         raise ImportError("six not installed, broken package?")
-    cls = load_library()
-    instance = cls(
+    cls = add_wrappers(
+        load_library(), generate_blocking, generate_tornado_func_style)
+    return cls(
         initial_object_pool_size=initial_size,
-        max_object_pool_size=max_object_pool_size)
-    for method in dir(instance):
-        func = getattr(instance, method)
-        if six.callable(func) and isinstance(func, types.MethodType) \
-                and not method.startswith('_') \
-                and 'callback' in inspect.getargspec(func).args:
-            if generate_blocking and not method.startswith('bl_'):
-                setattr(
-                    instance, 'bl_' + method,
-                    turn_async_into_sync(func))
-            if generate_tornado_func_style and not method.startswith('t_'):
-                setattr(
-                    instance, 't_' + method,
-                    rearrange_args_for_tornado(func))
-    return instance
+        max_object_pool_size=max_object_pool_size,
+        wake_loop_on_submit=wake_loop_on_submit,
+        event_loops=event_loops,
+        event_loop_routing=event_loop_routing,
+        max_in_flight=max_in_flight,
+        in_flight_low_watermark=in_flight_low_watermark,
+        backpressure_policy=backpressure_policy,
+        object_pool_capacities=object_pool_capacities,
+        record_results=record_results,
+        completion_dispatcher=completion_dispatcher,
+        coalesce_reads=coalesce_reads)
 
 
 def get_logger():
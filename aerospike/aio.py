@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+'''
+asyncio front end for a client made by get_client().
+
+Callbacks fire on the libevent threads; the results are handed
+over to the asyncio loop in batches.
+'''
+import collections
+import functools
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+from .common import WOULD_BLOCK
+
+
+class CompletionQueue(object):
+    '''
+    Collects finished calls from any thread and resolves their futures
+    on the asyncio loop.
+
+    Only the first completion after a drain schedules a wakeup
+    (call_soon_threadsafe), so a burst of completions costs the asyncio
+    loop one wakeup instead of one each.
+    '''
+    def __init__(self, loop):
+        self._loop = loop
+        self._completed = collections.deque()
+        self._scheduled = False
+
+    def callback_for(self, future):
+        completed = self._completed
+
+        def callback(*args):
+            completed.append((future, args))
+            if not self._scheduled:
+                self._scheduled = True
+                self._loop.call_soon_threadsafe(self._drain)
+        # a handoff already, no need to dispatch it
+        callback.run_inline = True
+        return callback
+
+    def _drain(self):
+        # Reset before draining: a completion that arrives from here on
+        # either gets drained below or schedules the next drain.
+        self._scheduled = False
+        completed = self._completed
+        while completed:
+            future, args = completed.popleft()
+            # A cancelled future has no one waiting on it.
+            if not future.done():
+                future.set_result(args)
+
+
+class AsyncioClient(object):
+    '''
+    Wrap a client so its asynchronous methods (those taking a callback
+    first, see generate_interface) return futures instead:
+
+        >>> client = AsyncioClient(aerospike.get_client())
+        >>> errors, bins, generation, expiration = \
+        ...     await client.get_key(namespace, keyset, keyname)
+
+    A future's result is the tuple of arguments the callback would have
+    been given, as with the bl_ methods. Everything else is passed
+    through to the wrapped client.
+
+    Results are only looked at once the bins are freed, so the wrapped
+    client is switched to decoding copies (bytes) of any blob values it
+    would otherwise have pointed into them.
+    '''
+    def __init__(self, client, loop=None):
+        if asyncio is None:
+            raise ImportError("asyncio is not available")
+        client._owned_values = True
+        self.client = client
+        self.loop = loop or asyncio.get_event_loop()
+        self._completions = CompletionQueue(self.loop)
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name not in type(self.client)._async_methods:
+            return attr
+        awaitable = self._make_awaitable(attr)
+        # Only looked up once per method.
+        setattr(self, name, awaitable)
+        return awaitable
+
+    def _make_awaitable(self, function):
+        loop = self.loop
+        callback_for = self._completions.callback_for
+
+        @functools.wraps(function)
+        def awaitable(*args, **kwargs):
+            future = loop.create_future()
+            if function(callback_for(future), *args, **kwargs) \
+                    is WOULD_BLOCK:
+                future.set_result(WOULD_BLOCK)
+            return future
+        return awaitable
@@ -1,17 +1,20 @@
 # -*- coding: utf-8 -*-
 
 import cffi
-from .constants import (DEFINES, MESSAGES, CLASS_NAMES)
+from .constants import (
+    DEFINES, LIBC_DEFINES, MESSAGES, CLASS_NAMES, COMPILED_FFI_MODULES)
 from .logger import logger
 from .implementations import get_implementations
 import os
-import six
 from .utils import detect_aerospike_libraries
+from .common import WOULD_BLOCK
 _library = None
+_wrapped_interfaces = {}
 import functools
-import time
+import importlib
 import threading
 import inspect
+getargspec = getattr(inspect, 'getfullargspec', None) or inspect.getargspec
 
 if 'LD_LIBRARY_PATH' in os.environ:
     os.environ['LIBRARY_PATH'] = os.environ['LD_LIBRARY_PATH']
@@ -31,6 +34,21 @@ def load_library(detected_libraries=None):
     return _library
 
 
+def compiled_ffi(version, library_type):
+    '''
+    Return the FFI setup.py precompiled for this library, or None
+    if there isn't one (we then parse the cdefs at runtime).
+    '''
+    try:
+        module_name = COMPILED_FFI_MODULES[(version, library_type)]
+    except KeyError:
+        return None
+    try:
+        return importlib.import_module(module_name).ffi
+    except ImportError:
+        return None
+
+
 class RawLibrary(object):
     '''This is a "magic" class. It will open shared librar(y|ies),
     locate every parsed function from the cdefinitions within them,
@@ -41,22 +59,38 @@ class RawLibrary(object):
     without needing to search through arbitrary library properties.
     '''
     def __init__(self, version, dependency, **kwargs):
-        ffi = cffi.FFI()
-        ffi.cdef(DEFINES[version][dependency.type])
+        ffi = compiled_ffi(version, dependency.type)
+        if ffi is None:
+            ffi = cffi.FFI()
+            ffi.cdef(DEFINES[version][dependency.type])
+            ffi.cdef(LIBC_DEFINES)
+            function_names = [
+                x[9:] for x in ffi._parser._declarations.keys()
+                if x.startswith('function ')]
+            # dlopen'ed libraries raise AttributeError for
+            # missing symbols...
+            symbol_errors = (AttributeError,)
+        else:
+            function_names = None
+            # ... precompiled ones, ffi.error.
+            symbol_errors = (AttributeError, ffi.error)
         self._extra_libraries = \
             [ffi.dlopen(lib.find_library()) for lib in dependency.dependencies]
         self._primary_library = ffi.dlopen(
             dependency.shared_object.find_library())
+        if function_names is None:
+            # Every declared function, global and constant. Only the
+            # functions are kept below.
+            function_names = dir(self._primary_library)
         self._wrapped_cfuncs = set()
-        for func_name in (x[9:] for x in ffi._parser._declarations.keys()
-                          if x.startswith('function ')):
+        for func_name in function_names:
             try:
                 func = getattr(self._primary_library, func_name)
-            except AttributeError:
+            except symbol_errors:
                 for library in self._extra_libraries:
                     try:
                         func = getattr(library, func_name)
-                    except AttributeError:
+                    except symbol_errors:
                         logger.warning(
                             MESSAGES['disabled_function'].format(
                                 dependency.shared_object.find_library(),
@@ -67,12 +101,14 @@ class RawLibrary(object):
                     self._wrapped_cfuncs.add(func_name)
                     setattr(self, func_name, func)
             else:
+                if not isinstance(func, ffi.CData) or \
+                        ffi.typeof(func).kind != 'function':
+                    continue
                 setattr(self, func_name, func)
                 self._wrapped_cfuncs.add(func_name)
         self.ffi = ffi
         self.version = version
         self.type = dependency.type
-        ffi.cdef("void free(void *ptr);")
         # open up LIBC where free lives...
         libc = ffi.dlopen(None)
         # This is needed because sometimes Aerospike
@@ -81,7 +117,7 @@ class RawLibrary(object):
         self._wrapped_cfuncs.add('free')
 
 
-def rearrange_args_for_tornado(function):
+def rearrange_args_for_tornado(function, method=False):
     '''
     Tornado's gen.Task(...) code expects a callback to
     be keyword-specifiable and at the end of the function def.
@@ -93,49 +129,133 @@ def rearrange_args_for_tornado(function):
     In order to make the closure reference 'function', we have
     to make a function that defines the true re-arranged function
     that we want.
+
+    method=True means function is a plain function on a class (takes self)
+    and the result should be put on a class too.
     '''
-    argspec = inspect.getargspec(function)
-    original_args = inspect.getargspec(function)
-    original_args.args.remove('self')
-    fixed_args = argspec.args
-    fixed_args.remove('callback')
-    fixed_args.remove('self')
-    func_def = \
-        "def wrapped{0}: return function{1}".format(
-            inspect.formatargspec(
-                fixed_args + ['callback'], argspec.varargs,
-                argspec.keywords,
-                (argspec.defaults or ()) + (None,)),
-            inspect.formatargspec(*original_args))
-    func_maker_body = \
-        ("def make_fn(function):\n    {0}\n    "
-         "return functools.wraps(function)(wrapped)").format(func_def)
+    args, varargs, keywords, defaults = getargspec(function)[:4]
+    args = [arg for arg in args if arg not in ('self', 'callback')]
+    defaults = tuple(defaults or ())
+    num_required = len(args) - len(defaults)
+    params = args[:num_required] + [
+        '{0}=defaults[{1}]'.format(name, index)
+        for index, name in enumerate(args[num_required:])]
+    params.append('callback=None')
+    call = ['callback'] + args
+    if varargs:
+        params.append('*' + varargs)
+        call.append('*' + varargs)
+    if keywords:
+        params.append('**' + keywords)
+        call.append('**' + keywords)
+    if method:
+        params.insert(0, 'self')
+        call.insert(0, 'self')
+    func_maker_body = (
+        "def make_fn(function, defaults):\n"
+        "    def wrapped({0}):\n"
+        "        return function({1})\n"
+        "    return functools.wraps(function)(wrapped)").format(
+            ', '.join(params), ', '.join(call))
     namespace = {'functools': functools}
     exec(func_maker_body, namespace)
-    wrapped_func = namespace['make_fn'](function)
+    wrapped_func = namespace['make_fn'](function, defaults)
     return wrapped_func
 
 
-def turn_async_into_sync(function):
-    holding_queue = six.moves.queue.Queue()
-    wait = threading.Event()
-    wait.set()
+class Completion(object):
+    '''
+    Callback for exactly one call. Holds on to the arguments it
+    was called with and wakes whoever is waiting on it.
+
+    A bare lock is the cheapest thing to park a thread on: it starts
+    out held, the callback releases it and wait() acquires it.
+
+    Releasing a lock is no work, so it is called straight from the event
+    loop whatever the completion_dispatcher (run_inline).
+    '''
+    __slots__ = ('_lock', 'result')
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lock.acquire()
+        self.result = None
+
+    def __call__(self, *args):
+        self.result = args
+        self._lock.release()
 
-    def callback(*args):
-        holding_queue.put(args)
-        wait.clear()
+    def wait(self):
+        self._lock.acquire()
+        return self.result
 
-    wrapped_func = functools.partial(function, callback)
+
+def turn_async_into_sync(function, method=False):
+    '''
+    Make a blocking version of an async function of form
+    F(callback, arg1, ..., argN) that returns the arguments the
+    callback was called with.
+
+    Every call waits on its own Completion, so any number of threads
+    can block on the same function at once.
+
+    method=True means function is a plain function on a class, of form
+    F(self, callback, arg1, ..., argN), and the result should be put on
+    a class too.
+    '''
+    if method:
+        @functools.wraps(function)
+        def blocking_method(self, *args, **kwargs):
+            completion = Completion()
+            if function(self, completion, *args, **kwargs) is WOULD_BLOCK:
+                return WOULD_BLOCK
+            return completion.wait()
+        return blocking_method
 
     @functools.wraps(function)
     def blocking_function(*args, **kwargs):
-        wrapped_func(*args, **kwargs)
-        while wait.is_set():
-            time.sleep(0.1)
-        return holding_queue.get()
+        completion = Completion()
+        if function(completion, *args, **kwargs) is WOULD_BLOCK:
+            return WOULD_BLOCK
+        return completion.wait()
     return blocking_function
 
 
+def takes_callback(function):
+    return 'callback' in getargspec(function)[0]
+
+
+def add_wrappers(cls, generate_blocking=True,
+                 generate_tornado_func_style=True):
+    '''
+    Return a subclass of a generated interface carrying the bl_ (blocking)
+    and/or t_ (Tornado style) versions of its asynchronous methods.
+
+    Making them involves inspect and exec, so it is done once per
+    combination and cached rather than repeated for every client.
+    '''
+    key = (cls, generate_blocking, generate_tornado_func_style)
+    try:
+        return _wrapped_interfaces[key]
+    except KeyError:
+        pass
+    members = {}
+    for name in cls._async_methods:
+        function = getattr(cls, name)
+        # Python 2 hands back an unbound method
+        function = getattr(function, '__func__', function)
+        if generate_blocking and not name.startswith('bl_'):
+            members['bl_' + name] = \
+                turn_async_into_sync(function, method=True)
+        if generate_tornado_func_style and not name.startswith('t_'):
+            members['t_' + name] = \
+                rearrange_args_for_tornado(function, method=True)
+    wrapped = type(cls.__name__, (cls,), members)
+    _wrapped_interfaces[key] = wrapped
+    return wrapped
+
+
 def generate_interface(version, dependency):
     '''
     Take our loosely ordered list of classes we've implemented
@@ -162,4 +282,12 @@ def generate_interface(version, dependency):
             cls.__init__(self, version, dependency, *args, **kwargs)
 
     class_interface.__init__ = __init__
+    # The public methods taking a callback, i.e. the ones that get
+    # bl_/t_ wrappers.
+    class_interface._async_methods = tuple(
+        name for name in dir(class_interface)
+        if not name.startswith('_') and
+        (inspect.isfunction(getattr(class_interface, name)) or
+         inspect.ismethod(getattr(class_interface, name))) and
+        takes_callback(getattr(class_interface, name)))
     return class_interface
@@ -56,6 +56,13 @@ typedef enum {
 void cf_set_log_level(cf_log_level level);
 
 //LibEvent controls
+// Only used to hand event_base_loopexit a timeout. tv_usec is a long on
+// Linux; on macOS it is a 32 bit int followed by padding, which lines up
+// on the little-endian machines we run on.
+struct timeval {
+	long tv_sec;
+	long tv_usec;
+};
 struct event_base * event_base_new (void);
 int event_base_dispatch (struct event_base *);
 void event_base_free (struct event_base *);
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+'''
+Out-of-line cffi declarations for the Aerospike 2 non-blocking library.
+
+setup.py builds these into aerospike._as2nb, so importing the driver
+loads ready-made type tables instead of running pycparser over as2nb.h.
+To build them in place in a checkout:
+
+    python -m aerospike.build_ffi
+'''
+import os
+import cffi
+from aerospike.constants import (
+    DEFINES, LIBC_DEFINES, COMPILED_FFI_MODULES, AEROSPIKE_2, NONBLOCKING)
+
+
+def make_ffibuilder(version, library_type):
+    ffibuilder = cffi.FFI()
+    ffibuilder.cdef(DEFINES[version][library_type])
+    ffibuilder.cdef(LIBC_DEFINES)
+    # ABI mode: as2nb.h mirrors structs that are private to the C client
+    # (e.g. ev2citrusleaf_cluster_s), so it can't be checked against the
+    # installed headers the way API mode would.
+    ffibuilder.set_source(COMPILED_FFI_MODULES[(version, library_type)], None)
+    return ffibuilder
+
+ffibuilder = make_ffibuilder(AEROSPIKE_2, NONBLOCKING)
+
+if __name__ == '__main__':
+    ffibuilder.compile(
+        tmpdir=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -1,42 +1,190 @@
 # -*- coding: utf-8 -*-
-import uuid
 from .logger import logger
 from six.moves import range as xrange
-from collections import defaultdict
+from collections import defaultdict, namedtuple, OrderedDict
+import six
+import threading
 import abc
 import time
+from .constants import (
+    BACKPRESSURE_BLOCK, BACKPRESSURE_RAISE, BACKPRESSURE_WOULD_BLOCK,
+    LOW_WATERMARK_RATIO, DISPATCH_INLINE)
+from .completion import DISPATCHERS, InlineDispatcher
+
+
+# Monotonic where we have it, so deadlines survive wall clock changes.
+clock = getattr(time, 'monotonic', time.time)
+
+PoolStats = namedtuple(
+    'PoolStats', ['hits', 'misses', 'evictions', 'high_water', 'available'])
 
 
 class ObjectPool(object):
+    '''
+    Recycles malloc'ed objects, by type.
+
+    Objects are checked out on application threads and checked back in on
+    the event loop thread. So every thread keeps a small cache of its own
+    (thread_cache_size per type) and moves objects to and from a shared,
+    locked, overflow in batches. The overflow holds up to the capacity of
+    the type (capacities, else max_capacity); anything beyond is dropped
+    (an eviction).
+
+    Counters are per thread as well and only summed by stats().
+    '''
     DEFAULT_CAPACITY = 1000
+    THREAD_CACHE_SIZE = 32
     IDENTITY = lambda x: x
 
-    def __init__(self, max_capacity=DEFAULT_CAPACITY):
-        self._available_pool = defaultdict(lambda: [])
-        self._available_pool_counters = defaultdict(lambda: 0)
+    def __init__(self, max_capacity=DEFAULT_CAPACITY, capacities=None,
+                 thread_cache_size=THREAD_CACHE_SIZE):
         self.max_capacity = max_capacity
+        self.capacities = dict(capacities or {})
+        self.thread_cache_size = thread_cache_size
+        self._lock = threading.Lock()
+        self._shared = defaultdict(list)
+        self._high_water = defaultdict(lambda: 0)
+        self._local = threading.local()
+        self._thread_counters = []
+
+    def capacity(self, type):
+        return self.capacities.get(type, self.max_capacity)
+
+    def set_capacity(self, type, capacity):
+        self.capacities[type] = capacity
+
+    def _thread_state(self):
+        try:
+            return self._local.cache, self._local.counters
+        except AttributeError:
+            cache = self._local.cache = defaultdict(list)
+            # type -> [hits, misses, evictions]
+            counters = self._local.counters = defaultdict(lambda: [0, 0, 0])
+            with self._lock:
+                self._thread_counters.append(counters)
+            return cache, counters
 
     def checkin(self, type, obj, clean_func=IDENTITY):
-        if self.max_capacity > self._available_pool_counters[type]:
-            clean_func(obj)
-            self._available_pool[type].append(obj)
-            self._available_pool_counters[type] += 1
+        cache, counters = self._thread_state()
+        capacity = self.capacity(type)
+        if capacity <= 0:
+            counters[type][2] += 1
+            return None
+        clean_func(obj)
+        objects = cache[type]
+        objects.append(obj)
+        if len(objects) > min(self.thread_cache_size, capacity):
+            self._spill(type, objects, counters[type], capacity)
         return None
 
+    def _spill(self, type, objects, counter, capacity):
+        '''
+        Move the newer half of a thread's cache to the shared overflow.
+        '''
+        keep = min(self.thread_cache_size, capacity) // 2
+        moving = objects[keep:]
+        del objects[keep:]
+        with self._lock:
+            shared = self._shared[type]
+            room = max(0, capacity - len(shared))
+            shared.extend(moving[:room])
+            if len(shared) > self._high_water[type]:
+                self._high_water[type] = len(shared)
+        counter[2] += max(0, len(moving) - room)
+
+    def _refill(self, type, objects):
+        wanted = max(1, self.thread_cache_size // 2)
+        with self._lock:
+            shared = self._shared[type]
+            if shared:
+                objects.extend(shared[-wanted:])
+                del shared[-wanted:]
+
     def checkout(self, type, object_creation_func,
                  object_creation_func_args=None):
-        obj = None
+        cache, counters = self._thread_state()
+        objects = cache[type]
+        if not objects:
+            self._refill(type, objects)
         try:
-            obj = self._available_pool[type].pop()
+            obj = objects.pop()
         except IndexError:
+            counters[type][1] += 1
             if object_creation_func_args:
                 obj = object_creation_func(*object_creation_func_args)
             else:
                 obj = object_creation_func()
         else:
-            self._available_pool_counters[type] -= 1
+            counters[type][0] += 1
         return obj
 
+    def stats(self):
+        '''
+        Return {type: PoolStats} for every type seen so far.
+
+        high_water is the most objects of a type ever idle in the shared
+        overflow; if it sits at the type's capacity (and evictions keep
+        climbing), the capacity is too small.
+        available counts the shared overflow only, not the per thread
+        caches.
+        '''
+        with self._lock:
+            thread_counters = list(self._thread_counters)
+            available = dict(
+                (type, len(objects)) for type, objects in
+                self._shared.items())
+            high_water = dict(self._high_water)
+        totals = defaultdict(lambda: [0, 0, 0])
+        for counters in thread_counters:
+            for type, counter in list(counters.items()):
+                total = totals[type]
+                for index, value in enumerate(counter):
+                    total[index] += value
+        types = set(totals) | set(available)
+        return dict(
+            (type, PoolStats(
+                totals[type][0], totals[type][1], totals[type][2],
+                high_water.get(type, 0), available.get(type, 0)))
+            for type in types)
+
+
+class InternCache(object):
+    '''
+    Remembers what factory(value) made for the most recently used
+    capacity values, i.e. a namespace's char[].
+
+    What the factory raises is not remembered.
+    '''
+    def __init__(self, factory, capacity):
+        self.factory = factory
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, value):
+        entries = self._entries
+        with self._lock:
+            try:
+                # move to the most recently used end
+                result = entries.pop(value)
+            except KeyError:
+                self.misses += 1
+            else:
+                entries[value] = result
+                self.hits += 1
+                return result
+        result = self.factory(value)
+        with self._lock:
+            entries[value] = result
+            while len(entries) > self.capacity:
+                entries.popitem(last=False)
+        return result
+
 
 class Constructor(object):
     __metaclass__ = abc.ABCMeta
@@ -57,89 +205,292 @@ class Constructor(object):
         '''
 
 
+class CallTable(object):
+    '''
+    The requests in flight on one event loop, kept in a slot array.
+
+    Instead of a malloc'ed string, a request's udata is an integer
+    handle cast to void *:
+
+        (generation << generation_shift) | (slot * stride + index)
+
+    The low bits name the table (every table owns one residue class
+    modulo stride) and the slot. The generation is bumped every time
+    the slot is freed, so a handle coming back for a slot that has since
+    been reused is caught instead of completing the wrong request.
+    '''
+    def __init__(self, ffi, index=0, stride=1, initial_size=0):
+        self.ffi = ffi
+        self.index = index
+        self.stride = stride
+        pointer_bits = ffi.sizeof('void *') * 8
+        self.generation_shift = 32 if pointer_bits > 32 else 24
+        self.location_mask = (1 << self.generation_shift) - 1
+        # keep clear of the sign bit
+        self.generation_limit = \
+            (1 << (pointer_bits - self.generation_shift - 1)) - 1
+        # slot -> generation, callback and references to hold
+        # until completed
+        self._generations = []
+        self._callbacks = []
+        self._refs = []
+        self._free_slots = []
+        # Only growing the arrays needs a lock; list.pop/append are atomic.
+        self._grow_lock = threading.Lock()
+        # prefill the slot array if desired:
+        for i in xrange(0, initial_size):
+            self._free_slots.append(self._grow())
+
+    def __len__(self):
+        return len(self._generations) - len(self._free_slots)
+
+    def _grow(self):
+        with self._grow_lock:
+            slot = len(self._generations)
+            if slot * self.stride + self.index > self.location_mask:
+                raise BackpressureError(
+                    "Out of handles with {0} requests in flight".format(
+                        len(self)))
+            # Start at 1 so no handle is ever NULL.
+            self._generations.append(1)
+            self._callbacks.append(None)
+            self._refs.append(None)
+        return slot
+
+    def checkin(self, callback, refs_to_hold):
+        try:
+            slot = self._free_slots.pop()
+        except IndexError:
+            slot = self._grow()
+        self._refs[slot] = refs_to_hold
+        self._callbacks[slot] = callback
+        return self.ffi.cast(
+            'void *',
+            (self._generations[slot] << self.generation_shift) |
+            (slot * self.stride + self.index))
+
+    def complete(self, handle):
+        slot = (handle & self.location_mask) // self.stride
+        generation = handle >> self.generation_shift
+        try:
+            callback = self._callbacks[slot]
+        except IndexError:
+            raise KeyError(handle)
+        if callback is None or self._generations[slot] != generation:
+            raise KeyError(handle)
+        refs_to_hold = self._refs[slot]
+        self._callbacks[slot] = self._refs[slot] = None
+        self._generations[slot] = generation % self.generation_limit + 1
+        self._free_slots.append(slot)
+        return callback, refs_to_hold
+
+
+class InFlightWindow(object):
+    '''
+    Counts requests between checkin and callback and closes once
+    high_watermark of them are in flight. It stays closed until enough
+    callbacks have come back to bring the count down to low_watermark.
+    '''
+    def __init__(self, high_watermark, low_watermark=None):
+        if high_watermark < 1:
+            raise ValueError("high_watermark must be at least 1")
+        if low_watermark is None:
+            low_watermark = int(high_watermark * LOW_WATERMARK_RATIO)
+        if not 0 <= low_watermark < high_watermark:
+            raise ValueError(
+                "low_watermark must be in [0, {0})".format(high_watermark))
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.depth = 0
+        self.full = False
+        self._condition = threading.Condition()
+
+    def acquire(self, wait=True, force=False, timeout=None):
+        '''
+        Take a slot. Returns False if the window is closed and we may
+        neither wait for it (or waited timeout seconds already) nor force
+        our way in.
+        '''
+        with self._condition:
+            if timeout is not None:
+                deadline = clock() + timeout
+            while self.full and not force:
+                if not wait:
+                    return False
+                if timeout is None:
+                    self._condition.wait()
+                    continue
+                remaining = deadline - clock()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            self.depth += 1
+            if not self.full and self.depth >= self.high_watermark:
+                self.full = True
+            return True
+
+    def release(self):
+        with self._condition:
+            self.depth -= 1
+            if self.full and self.depth <= self.low_watermark:
+                self.full = False
+                self._condition.notify_all()
+
+
 class Base(object):
     __metaclass__ = abc.ABCMeta
     priority = -1
 
     def __init__(self, *args, **kwargs):
         self.state = defaultdict(lambda: 0)
-        # mapping of uid -> (callback, [references_to_hold_until_completed])
-        self.unique_ids_available = []
-        self.outstanding_calls = {}
-        self.generic_pool = ObjectPool()
-        self.bigint = 1
-        self.outstanding_total = 0
-
-        self.num_unique_ids_available = 0
-        # prefill the uniq_id pool if desired:
-        for i in xrange(0, kwargs['initial_object_pool_size']):
-            self.unique_ids_available.append(self.__generate_uuid())
-        self.num_unique_ids_available = len(self.unique_ids_available)
         self.max_object_pool_size = \
             kwargs.get('max_object_pool_size', float('inf'))
-        self._on = True
+        if self.max_object_pool_size is None or \
+                self.max_object_pool_size < 0:
+            self.max_object_pool_size = 0
+        # C type names (i.e. 'cf_digest *') or ctypes -> capacity
+        capacities = dict(
+            (self.ffi.typeof(type)
+             if isinstance(type, six.string_types) else type, capacity)
+            for type, capacity in
+            (kwargs.get('object_pool_capacities') or {}).items())
+        self.generic_pool = ObjectPool(self.max_object_pool_size, capacities)
+        # One table of outstanding calls per event loop, so each loop
+        # only ever completes against its own.
+        num_tables = max(1, kwargs.get('event_loops') or 1)
+        initial_size = kwargs['initial_object_pool_size'] // num_tables
+        self._call_tables = [
+            CallTable(self.ffi, index, num_tables, initial_size)
+            for index in xrange(num_tables)]
+        self._backpressure_policy = \
+            kwargs.get('backpressure_policy') or BACKPRESSURE_BLOCK
+        if self._backpressure_policy not in (
+                BACKPRESSURE_BLOCK, BACKPRESSURE_RAISE,
+                BACKPRESSURE_WOULD_BLOCK):
+            raise ValueError(
+                "Unknown backpressure_policy {0!r}".format(
+                    self._backpressure_policy))
+        # Hand callbacks a Record instead of a bins dict
+        self._record_results = bool(kwargs.get('record_results'))
+        # Share one request between identical reads in flight
+        self._coalesce_reads = bool(kwargs.get('coalesce_reads'))
+        # A dispatcher we make is ours to shut down, one given to us isn't
+        dispatcher = kwargs.get('completion_dispatcher') or DISPATCH_INLINE
+        self._owns_dispatcher = isinstance(dispatcher, six.string_types)
+        if self._owns_dispatcher:
+            try:
+                dispatcher = DISPATCHERS[dispatcher]()
+            except KeyError:
+                raise ValueError(
+                    "Unknown completion_dispatcher {0!r}".format(dispatcher))
+        self.completion_dispatcher = dispatcher
+        self._dispatch_callbacks = type(dispatcher) is not InlineDispatcher
+        # Decode values that outlive the C callback as copies: any that
+        # are dispatched do, as do those handed off to an AsyncioClient
+        self._owned_values = self._dispatch_callbacks
+        self._in_flight = None
+        if kwargs.get('max_in_flight'):
+            self._in_flight = InFlightWindow(
+                kwargs['max_in_flight'],
+                kwargs.get('in_flight_low_watermark'))
+
+    @property
+    def outstanding_total(self):
+        '''
+        Return the number of requests awaiting a callback.
+        '''
+        return sum(len(table) for table in self._call_tables)
 
-    def _async_checkin(self, callback, refs_to_hold):
+    @property
+    def object_pool_stats(self):
+        '''
+        Return {C type name: PoolStats} for the pooled C objects.
         '''
-        Return void* of a unique id.
+        return dict(
+            (self.ffi.getctype(type), stats)
+            for type, stats in self.generic_pool.stats().items())
+
+    @property
+    def in_flight(self):
+        '''
+        Return the number of requests admitted through the in-flight
+        window (same as outstanding_total when max_in_flight is unset).
+        '''
+        if self._in_flight is None:
+            return self.outstanding_total
+        return self._in_flight.depth
+
+    def _async_checkin(self, callback, refs_to_hold, partition=0,
+                       timeout_ms=None):
+        '''
+        Return void* of a unique handle.
 
         This is a special case, as we use this to hold onto C-value references
-        from Garbage Collection until the uuid returns to us.
+        from Garbage Collection until the handle returns to us.
 
         Use the generic_pool for everything else!
 
-        Try to grab from the object pool first before malloc'ing
-        a new c string and making a cast to (void*).
-        '''
-        uid = cuid = void_ptr = None
-        if self.num_unique_ids_available:
-            try:
-                uid, cuid, void_ptr = self.unique_ids_available.pop()
-            except IndexError:
-                if self.max_object_pool_size < float('inf') and self._on:
-                    # self._pause_event_loop()
-                    # self._on = False
-                    pass
-            else:
-                self.num_unique_ids_available -= 1
-        if uid is None:
-            uid, cuid, void_ptr = self.__generate_uuid()
-        self.outstanding_calls[uid] = (callback, refs_to_hold, cuid, void_ptr)
-        self.outstanding_total += 1
-        return void_ptr
+        partition is the index of the event loop the request will
+        be run on.
 
-    def __generate_uuid(self):
-        self.bigint += 1
-        uid = str(self.bigint).encode('utf8')
-        cuid = self.ffi.new('char[]', uid)
-        void_ptr = self.ffi.cast('void *', cuid)
-        return uid, cuid, void_ptr
+        If max_in_flight was given and the window is full, either wait
+        for room (up to the request's timeout_ms) or raise
+        BackpressureError, depending on the backpressure_policy. An event
+        loop thread never waits (it is the one that has to drain the
+        window), it goes over the limit instead.
+        '''
+        if self._in_flight is not None:
+            blocking = self._backpressure_policy == BACKPRESSURE_BLOCK
+            if not self._in_flight.acquire(
+                    wait=blocking,
+                    force=blocking and self._on_event_loop_thread(),
+                    timeout=None if timeout_ms is None
+                    else timeout_ms / 1000.0):
+                raise BackpressureError(
+                    "{0} requests in flight, limit is {1}".format(
+                        self._in_flight.depth,
+                        self._in_flight.high_watermark))
+        return self._call_tables[partition].checkin(callback, refs_to_hold)
 
-    def _async_complete(self, uid):
+    def _async_complete(self, udata_ptr):
         '''
-        Return the callback and the references being held to avoid a GC.
+        Return the callback and the references being held to avoid a GC
+        for the void* handle given back by the C library.
 
-        Check the unique id back into the pool for re-use later to
-        avoid an expensive malloc.
+        The handle's slot is freed for re-use.
         '''
+        handle = int(self.ffi.cast('uintptr_t', udata_ptr))
+        call_tables = self._call_tables
         try:
-            callback, refs_to_hold, cuid, void_ptr = \
-                self.outstanding_calls.pop(uid)
+            result = call_tables[
+                (handle & call_tables[0].location_mask) %
+                len(call_tables)].complete(handle)
         except KeyError:
             logger.exception(
                 ("Fatal fault in _handle_callback. "
-                 "Unable to find uid {0}").format(uid))
+                 "Unable to find handle {0:#x}").format(handle))
         else:
-            self.outstanding_total -= 1
-            # if self.outstanding_total < 700:
-            #     self._resume_event_loop()
-            #     self._on = True
-            if self.num_unique_ids_available < self.max_object_pool_size:
-                self.unique_ids_available.append((uid, cuid, void_ptr,))
-                self.num_unique_ids_available += 1
-            return callback, refs_to_hold
+            if self._in_flight is not None:
+                self._in_flight.release()
+            if self._dispatch_callbacks:
+                callback, refs_to_hold = result
+                return self._dispatched(callback), refs_to_hold
+            return result
         return None
 
+    def _dispatched(self, callback):
+        '''
+        Return what the event loop should call in place of callback,
+        as the completion_dispatcher has it.
+
+        Waking a bl_ call (or an asyncio handoff) is quicker done than
+        dispatched; anything with a true run_inline is called directly.
+        '''
+        if self._dispatch_callbacks and \
+                not getattr(callback, 'run_inline', False):
+            return self.completion_dispatcher.wrap(callback)
+        return callback
+
     @abc.abstractmethod
     def _get_log_level(self):
         raise NotImplementedError
@@ -164,6 +515,22 @@ class Base(object):
 class StateError(Exception):
     pass
 
+
+class BackpressureError(Exception):
+    '''
+    Raised when a request is refused because max_in_flight
+    requests are already outstanding.
+    '''
+
+
+class _WouldBlock(object):
+    def __repr__(self):
+        return 'WOULD_BLOCK'
+
+# Returned instead of submitting when the backpressure_policy
+# is BACKPRESSURE_WOULD_BLOCK and the in-flight window is full.
+WOULD_BLOCK = _WouldBlock()
+
 # possibility of object pooling?
 # def check_out(ffi, ctype):
 #     try:
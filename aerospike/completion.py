@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+'''
+Completion dispatchers decide where a callback runs once its request
+has completed: right there on the event loop thread, on worker threads
+or in bulk wherever the application drains them.
+
+(Not to be confused with dispatchers.py, which feeds requests to the
+event loops.)
+'''
+from collections import deque
+from six.moves import queue
+from six.moves import range as xrange
+import functools
+import threading
+from .logger import logger
+from .constants import (
+    DISPATCH_INLINE, DISPATCH_THREAD_POOL, DISPATCH_QUEUE,
+    DEFAULT_DISPATCH_WORKERS)
+
+
+def run_callback(callback, args):
+    try:
+        callback(*args)
+    except Exception:
+        logger.exception("Unhandled exception in callback {0!r}".format(
+            callback))
+
+
+class InlineDispatcher(object):
+    '''
+    Runs callbacks as soon as their request completes, on the event loop
+    thread. Nothing else happens on that loop until they return.
+    '''
+    def wrap(self, callback):
+        '''
+        Return what the event loop should call in place of callback.
+        '''
+        return callback
+
+    def shutdown(self):
+        pass
+
+
+class ThreadPoolDispatcher(InlineDispatcher):
+    '''
+    Queues callbacks up for a pool of worker threads, so the event loop
+    only decodes results and releases what the request held.
+
+    Callbacks may run out of order and concurrently with one another.
+    '''
+    def __init__(self, workers=DEFAULT_DISPATCH_WORKERS):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self._queue = queue.Queue()
+        self._workers = []
+        for index in xrange(workers):
+            worker = threading.Thread(
+                target=self._work,
+                name='aerospike-dispatch-{0}'.format(index))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def wrap(self, callback):
+        return functools.partial(self._dispatch, callback)
+
+    def _dispatch(self, callback, *args):
+        self._queue.put((callback, args))
+
+    def _work(self):
+        get = self._queue.get
+        while True:
+            item = get()
+            if item is None:
+                return
+            run_callback(*item)
+
+    def shutdown(self):
+        '''
+        Run what is queued and stop the workers.
+        '''
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            if worker is not threading.current_thread():
+                worker.join()
+        del self._workers[:]
+
+
+class QueueDispatcher(InlineDispatcher):
+    '''
+    Collects completed callbacks for the application to run in bulk,
+    on a thread of its choosing, with drain():
+
+        >>> client = aerospike.get_client(completion_dispatcher='queue')
+        >>> while running:
+        ...     client.completion_dispatcher.drain(timeout=0.1)
+
+    Completing a request costs the event loop an append and, only for the
+    first completion after a drain, waking the drainer.
+    '''
+    def __init__(self):
+        self._completed = deque()
+        self._ready = threading.Event()
+
+    def __len__(self):
+        return len(self._completed)
+
+    def wrap(self, callback):
+        return functools.partial(self._dispatch, callback)
+
+    def _dispatch(self, callback, *args):
+        self._completed.append((callback, args))
+        if not self._ready.is_set():
+            self._ready.set()
+
+    def drain(self, timeout=0, max_callbacks=None):
+        '''
+        Run the callbacks completed so far (up to max_callbacks of them)
+        in the calling thread and return how many ran.
+
+        timeout is how long to wait for the first one, None being
+        forever.
+        '''
+        if timeout != 0 and not self._ready.wait(timeout):
+            return 0
+        # Clear before draining: a completion that arrives from here on
+        # either gets drained below or sets it again.
+        self._ready.clear()
+        completed = self._completed
+        count = 0
+        while completed and (max_callbacks is None or count < max_callbacks):
+            run_callback(*completed.popleft())
+            count += 1
+        if completed:
+            self._ready.set()
+        return count
+
+    def shutdown(self):
+        self.drain()
+
+
+DISPATCHERS = {
+    DISPATCH_INLINE: InlineDispatcher,
+    DISPATCH_THREAD_POOL: ThreadPoolDispatcher,
+    DISPATCH_QUEUE: QueueDispatcher,
+}
@@ -4,6 +4,42 @@ from collections import namedtuple
 DEFAULT_OBJECT_POOL_SIZE = 4096
 DEFAULT_INITIAL_POOL_SIZE = 1024
 DEFAULT_TIMEOUT_MS = 1000
+DEFAULT_EVENT_LOOPS = 1
+
+# How LibEvent spreads requests over its event loops
+ROUTE_ROUND_ROBIN = 'round_robin'
+ROUTE_BY_KEY = 'key'
+
+# What to do with a request when max_in_flight requests are outstanding
+BACKPRESSURE_BLOCK = 'block'
+BACKPRESSURE_RAISE = 'raise'
+BACKPRESSURE_WOULD_BLOCK = 'would_block'
+# in_flight_low_watermark defaults to this fraction of max_in_flight
+LOW_WATERMARK_RATIO = 0.75
+
+# Where callbacks run once a request completes (see get_client)
+DISPATCH_INLINE = 'inline'
+DISPATCH_THREAD_POOL = 'thread_pool'
+DISPATCH_QUEUE = 'queue'
+# Worker threads of a DISPATCH_THREAD_POOL dispatcher
+DEFAULT_DISPATCH_WORKERS = 4
+
+# Retrying submissions the C library refused (client error/throttled).
+# Backoff doubles per attempt from RETRY_BACKOFF_MS up to
+# RETRY_BACKOFF_MAX_MS, with half of it randomized.
+RETRY_BACKOFF_MS = 5
+RETRY_BACKOFF_MAX_MS = 1000
+# Resolution and size of the timer wheel holding work to be retried.
+RETRY_TICK_MS = 5
+RETRY_WHEEL_SLOTS = 256
+
+# put_key pools bin arrays by the next of these sizes up; writes with
+# more bins get an array of their own.
+BIN_ARRAY_SIZE_CLASSES = (1, 2, 4, 8, 16, 32, 64)
+
+# How many namespaces/sets and bin names are kept encoded (and ready to
+# hand to the C library) at a time.
+INTERN_CACHE_SIZE = 256
 
 DEPENDENCY = namedtuple("DEPENDENCY", "shared_object type dependencies")
 NONBLOCKING = 1
@@ -17,6 +53,11 @@ CLASS_NAMES = {
     (AEROSPIKE_2, NONBLOCKING): "Aerospike2Nonblocking"
 }
 
+# Modules setup.py precompiles the cdefs below into (see build_ffi.py).
+COMPILED_FFI_MODULES = {
+    (AEROSPIKE_2, NONBLOCKING): "aerospike._as2nb"
+}
+
 this_dir = os.path.dirname(os.path.abspath(__file__))
 MESSAGES = {
     'disabled_function': ("Unable to detect function "
@@ -36,6 +77,12 @@ def read(fn):
         content = fh.read()
     return content
 
+# Sometimes Aerospike does not provide a free function for a call,
+# so libc's is declared alongside every library.
+LIBC_DEFINES = """
+void free(void *ptr);
+"""
+
 DEFINES = {
     AEROSPIKE_3: {
         BLOCKING: """
@@ -1,11 +1,74 @@
 import abc
+import binascii
+import six
+from .constants import DEFAULT_TIMEOUT_MS
 
 
-class Digest(tuple):
+class Digest(object):
+    '''
+    The 20 bytes a cluster knows a record by (RIPEMD-160 of the set and
+    key name), kept as bytes in raw.
+
+    Make one from the raw bytes, from hex (from_hex) or, as before, from
+    20 ints. Digests hash and compare by their bytes, and only equal
+    other Digests: unlike the tuple of ints a Digest used to be, one no
+    longer equals tuple(digest), so compare Digest(ints) instead.
+    '''
     __metaclass__ = abc.ABCMeta
+    __slots__ = ('raw',)
+    SIZE = 20
+
+    def __init__(self, raw):
+        if not isinstance(raw, bytes):
+            raw = bytes(bytearray(raw))
+        if len(raw) != self.SIZE:
+            raise ValueError(
+                "Invalid Digest! {0} bytes instead of {1}".format(
+                    len(raw), self.SIZE))
+        self.raw = raw
+
+    @classmethod
+    def from_hex(cls, text):
+        return cls(binascii.unhexlify(text))
+
+    @classmethod
+    def from_bytes(cls, raw):
+        return cls(raw)
+
+    def hex(self):
+        return binascii.hexlify(self.raw).decode('ascii')
+
+    def __len__(self):
+        return self.SIZE
+
+    def __iter__(self):
+        return iter(bytearray(self.raw))
+
+    def __bytes__(self):
+        return self.raw
+
+    def __hash__(self):
+        return hash(self.raw)
+
+    def __eq__(self, other):
+        if not isinstance(other, Digest):
+            return NotImplemented
+        return self.raw == other.raw
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __reduce__(self):
+        return type(self), (self.raw,)
+
+    def __repr__(self):
+        return '{0}.from_hex({1!r})'.format(type(self).__name__, self.hex())
 
     @abc.abstractmethod
-    def encode_container(digest_container):
+    def encode_container(self, digest_container):
         '''
         Digests are arrays of integers denoting a uniq id.
 
@@ -13,3 +76,236 @@ class Digest(tuple):
         container object from the array encoded within.
         '''
         raise NotImplementedError
+
+
+class Key(object):
+    '''
+    A record's namespace, set and key name.
+
+    The key operations take a Key in place of
+    (namespace, keyset, key_identifier). The client prepares its C
+    objects (and digest) the first time it sees a Key and keeps them on
+    it, so hang on to Keys for records you hit over and over.
+
+    Keys compare and hash like the (namespace, set, user_key) tuple.
+    '''
+    __slots__ = ('namespace', 'set', 'user_key', '_hash', '_prepared')
+
+    def __init__(self, namespace, set, user_key):
+        self.namespace = namespace
+        self.set = set
+        self.user_key = user_key
+        self._hash = hash((namespace, set, user_key))
+        # Whatever the client made of this key, see
+        # AS2Base._prepared_key
+        self._prepared = None
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, Key):
+            return NotImplemented
+        return (self.namespace, self.set, self.user_key) == \
+            (other.namespace, other.set, other.user_key)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __repr__(self):
+        return 'Key({0!r}, {1!r}, {2!r})'.format(
+            self.namespace, self.set, self.user_key)
+
+
+def shift_key_arguments(keyset, key_identifier, *parameters):
+    '''
+    A Key passed as namespace takes the place of (namespace, keyset,
+    key_identifier), so whatever followed it positionally landed in
+    keyset and key_identifier. Move those on to the parameters after
+    key_identifier, given as (name, value, default) in order, and
+    return their values.
+
+        >>> timeout_ms, = shift_key_arguments(
+        ...     keyset, key_identifier,
+        ...     ('timeout_ms', timeout_ms, DEFAULT_TIMEOUT_MS))
+
+    Raises TypeError if a parameter ends up with two values or more
+    arguments were given than there are parameters.
+    '''
+    values = [value for _, value, _ in parameters]
+    for index, argument in enumerate((keyset, key_identifier)):
+        if argument is None:
+            continue
+        if index >= len(parameters):
+            raise TypeError(
+                "Too many positional arguments after a Key")
+        name, value, default = parameters[index]
+        if value != default:
+            raise TypeError(
+                "Got multiple values for {0} after a Key".format(name))
+        values[index] = argument
+    return values
+
+
+class KeyPipeline(object):
+    '''
+    Operations on a single key, run in order by execute() in one
+    round trip. Get one from client.key_pipeline(...):
+
+        >>> pipeline = client.key_pipeline(namespace, keyset, keyname)
+        >>> pipeline.incr('hits').write('seen', b'yes').read('hits')
+        >>> pipeline.execute(callback)
+
+    execute's callback is called like get_key's, with the bins read.
+    '''
+    __metaclass__ = abc.ABCMeta
+    INCR = 'incr'
+    APPEND = 'append'
+    PREPEND = 'prepend'
+    READ = 'read'
+    WRITE = 'write'
+
+    def __init__(self, namespace, keyset=None, key_identifier=None,
+                 create_key_if_missing=False):
+        self.namespace = namespace
+        self.keyset = keyset
+        self.key_identifier = key_identifier
+        self.create_key_if_missing = create_key_if_missing
+        # (operation, bin name, value)
+        self.operations = []
+        self.expiration = None
+
+    def incr(self, bin_name, amount=1):
+        self.operations.append((self.INCR, bin_name, amount))
+        return self
+
+    def append(self, bin_name, value):
+        self.operations.append((self.APPEND, bin_name, value))
+        return self
+
+    def prepend(self, bin_name, value):
+        self.operations.append((self.PREPEND, bin_name, value))
+        return self
+
+    def read(self, *bin_names):
+        for bin_name in bin_names:
+            self.operations.append((self.READ, bin_name, None))
+        return self
+
+    def write(self, bin_name, value):
+        '''Set a bin, or delete it with a value of None.'''
+        self.operations.append((self.WRITE, bin_name, value))
+        return self
+
+    def touch(self, expiration):
+        '''Set the record to expire in expiration seconds.'''
+        self.expiration = expiration
+        return self
+
+    @abc.abstractmethod
+    def execute(self, callback, write_parameters=None,
+                timeout_ms=DEFAULT_TIMEOUT_MS):
+        '''
+        Run the operations.
+
+        Expects callback of form: f(error_code, bins, generation, expiration)
+        '''
+        raise NotImplementedError
+
+
+class Record(object):
+    '''
+    A record read back: its bins, generation and expiration.
+
+    Clients made with record_results=True pass one of these in place of
+    the bins dict (the callback is still called with generation and
+    expiration after it). Bin names and values are kept in two tuples,
+    bin_names being shared by every record read with the same bins; the
+    dict is only built if asked for (bins), otherwise a Record reads
+    like one:
+
+        >>> record['hits'], record.get('missing'), dict(record.items())
+    '''
+    __slots__ = (
+        'bin_names', 'bin_values', 'generation', 'expiration', '_bins')
+
+    def __init__(self, bin_names, bin_values, generation=0, expiration=0):
+        self.bin_names = bin_names
+        self.bin_values = bin_values
+        self.generation = generation
+        self.expiration = expiration
+        self._bins = None
+
+    def copy(self):
+        '''
+        Return a Record of its own (bins dict and all) sharing the name
+        and value tuples.
+        '''
+        return Record(
+            self.bin_names, self.bin_values, self.generation, self.expiration)
+
+    @property
+    def bins(self):
+        if self._bins is None:
+            self._bins = dict(zip(self.bin_names, self.bin_values))
+        return self._bins
+
+    def __getitem__(self, name):
+        if isinstance(name, six.text_type):
+            name = name.encode('utf8')
+        if self._bins is not None or len(self.bin_names) > 8:
+            return self.bins[name]
+        # a scan beats building the dict for the odd lookup
+        # in a narrow record
+        try:
+            return self.bin_values[self.bin_names.index(name)]
+        except ValueError:
+            raise KeyError(name)
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __contains__(self, name):
+        if isinstance(name, six.text_type):
+            name = name.encode('utf8')
+        return name in self.bin_names
+
+    def __iter__(self):
+        return iter(self.bin_names)
+
+    def __len__(self):
+        return len(self.bin_names)
+
+    def keys(self):
+        return list(self.bin_names)
+
+    def values(self):
+        return list(self.bin_values)
+
+    def items(self):
+        return list(zip(self.bin_names, self.bin_values))
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.bins
+        if not isinstance(other, dict):
+            return NotImplemented
+        return self.bins == other
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'Record({0!r}, generation={1!r}, expiration={2!r})'.format(
+            self.bins, self.generation, self.expiration)
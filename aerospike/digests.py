@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+'''
+Record digests computed in Python, the way ev2citrusleaf_calculate_digest
+does it:
+
+    RIPEMD-160(set + key type + key bytes)
+
+where an integer key is its type (1) and 8 bytes big endian, and a string
+key its type (3) and its (UTF-8) bytes.
+
+hashlib's ripemd160 is used when OpenSSL has it, the pure Python one
+below otherwise. No C library (or client) needed, so offline jobs can use
+this too.
+'''
+import hashlib
+import struct
+import six
+from six.moves import range as xrange
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DIGEST_SIZE = 20
+KEY_TYPE_INT = 1
+KEY_TYPE_STR = 3
+
+_INITIAL = (0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476, 0xC3D2E1F0)
+_MASK = 0xffffffff
+# message word, rotation and constant per step; left line, then right
+_WORDS_LEFT = (
+    0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15,
+    7, 4, 13, 1, 10, 6, 15, 3, 12, 0, 9, 5, 2, 14, 11, 8,
+    3, 10, 14, 4, 9, 15, 8, 1, 2, 7, 0, 6, 13, 11, 5, 12,
+    1, 9, 11, 10, 0, 8, 12, 4, 13, 3, 7, 15, 14, 5, 6, 2,
+    4, 0, 5, 9, 7, 12, 2, 10, 14, 1, 3, 8, 11, 6, 15, 13)
+_WORDS_RIGHT = (
+    5, 14, 7, 0, 9, 2, 11, 4, 13, 6, 15, 8, 1, 10, 3, 12,
+    6, 11, 3, 7, 0, 13, 5, 10, 14, 15, 8, 12, 4, 9, 1, 2,
+    15, 5, 1, 3, 7, 14, 6, 9, 11, 8, 12, 2, 10, 0, 4, 13,
+    8, 6, 4, 1, 3, 11, 15, 0, 5, 12, 2, 13, 9, 7, 10, 14,
+    12, 15, 10, 4, 1, 5, 8, 7, 6, 2, 13, 14, 0, 3, 9, 11)
+_ROTATIONS_LEFT = (
+    11, 14, 15, 12, 5, 8, 7, 9, 11, 13, 14, 15, 6, 7, 9, 8,
+    7, 6, 8, 13, 11, 9, 7, 15, 7, 12, 15, 9, 11, 7, 13, 12,
+    11, 13, 6, 7, 14, 9, 13, 15, 14, 8, 13, 6, 5, 12, 7, 5,
+    11, 12, 14, 15, 14, 15, 9, 8, 9, 14, 5, 6, 8, 6, 5, 12,
+    9, 15, 5, 11, 6, 8, 13, 12, 5, 12, 13, 14, 11, 8, 5, 6)
+_ROTATIONS_RIGHT = (
+    8, 9, 9, 11, 13, 15, 15, 5, 7, 7, 8, 11, 14, 14, 12, 6,
+    9, 13, 15, 7, 12, 8, 9, 11, 7, 7, 12, 7, 6, 15, 13, 11,
+    9, 7, 15, 11, 8, 6, 6, 14, 12, 13, 5, 14, 13, 13, 7, 5,
+    15, 5, 8, 11, 14, 14, 6, 14, 6, 9, 12, 9, 12, 5, 15, 8,
+    8, 5, 12, 9, 12, 5, 14, 6, 8, 13, 6, 5, 15, 13, 11, 11)
+_CONSTANTS_LEFT = (
+    0x00000000, 0x5A827999, 0x6ED9EBA1, 0x8F1BBCDC, 0xA953FD4E)
+_CONSTANTS_RIGHT = (
+    0x50A28BE6, 0x5C4DD124, 0x6D703EF3, 0x7A6D76E9, 0x00000000)
+
+
+def _f(round, x, y, z):
+    if round == 0:
+        return x ^ y ^ z
+    if round == 1:
+        return (x & y) | (~x & z)
+    if round == 2:
+        return (x | ~y) ^ z
+    if round == 3:
+        return (x & z) | (y & ~z)
+    return x ^ (y | ~z)
+
+
+def _rotate(x, n):
+    x &= _MASK
+    return ((x << n) | (x >> (32 - n))) & _MASK
+
+
+def _compress(state, block):
+    words = struct.unpack('<16I', block)
+    al, bl, cl, dl, el = state
+    ar, br, cr, dr, er = state
+    for step in xrange(80):
+        round = step >> 4
+        t = _rotate(
+            al + _f(round, bl, cl, dl) + words[_WORDS_LEFT[step]] +
+            _CONSTANTS_LEFT[round], _ROTATIONS_LEFT[step]) + el
+        al, el, dl, cl, bl = el, dl, _rotate(cl, 10), bl, t & _MASK
+        t = _rotate(
+            ar + _f(4 - round, br, cr, dr) + words[_WORDS_RIGHT[step]] +
+            _CONSTANTS_RIGHT[round], _ROTATIONS_RIGHT[step]) + er
+        ar, er, dr, cr, br = er, dr, _rotate(cr, 10), br, t & _MASK
+    h0, h1, h2, h3, h4 = state
+    return ((h1 + cl + dr) & _MASK, (h2 + dl + er) & _MASK,
+            (h3 + el + ar) & _MASK, (h4 + al + br) & _MASK,
+            (h0 + bl + cr) & _MASK)
+
+
+def ripemd160(data):
+    '''
+    Pure Python RIPEMD-160 of data (bytes), for when hashlib has none.
+    '''
+    length = len(data)
+    data = data + b'\x80' + b'\x00' * ((55 - length) % 64) + \
+        struct.pack('<Q', (length * 8) & 0xffffffffffffffff)
+    state = _INITIAL
+    for offset in xrange(0, len(data), 64):
+        state = _compress(state, data[offset:offset + 64])
+    return struct.pack('<5I', *state)
+
+
+def _hashlib_ripemd160(data):
+    return hashlib.new('ripemd160', data).digest()
+
+try:
+    _hashlib_ripemd160(b'')
+except ValueError:
+    # OpenSSL 3 keeps it in the legacy provider
+    digest_function = ripemd160
+else:
+    digest_function = _hashlib_ripemd160
+
+
+def key_bytes(keyname):
+    '''
+    Return the type byte and bytes of a key name, as hashed into a digest.
+    '''
+    if isinstance(keyname, six.integer_types):
+        return struct.pack('>Bq', KEY_TYPE_INT, keyname)
+    if isinstance(keyname, six.text_type):
+        keyname = keyname.encode('utf8')
+    elif not isinstance(keyname, six.binary_type):
+        raise ValueError(
+            ("Unsupported key type! "
+             "Must be a numeric, unicode string or bytes!"))
+    return struct.pack('B', KEY_TYPE_STR) + keyname
+
+
+def key_digest(keyset, keyname):
+    '''
+    Return the 20 byte digest of keyname in keyset.
+    '''
+    if isinstance(keyset, six.text_type):
+        keyset = keyset.encode('utf8')
+    return digest_function(keyset + key_bytes(keyname))
+
+
+def calculate_digests(keyset, keys):
+    '''
+    Return the digests of keys in keyset, one after the other in a
+    bytearray of len(keys) * 20 bytes; a (len(keys), 20) uint8 array
+    if keys is a NumPy array.
+    '''
+    if isinstance(keyset, six.text_type):
+        keyset = keyset.encode('utf8')
+    is_array = numpy is not None and isinstance(keys, numpy.ndarray)
+    if is_array:
+        keys = keys.tolist()
+    digests = bytearray(len(keys) * DIGEST_SIZE)
+    for index, keyname in enumerate(keys):
+        offset = index * DIGEST_SIZE
+        digests[offset:offset + DIGEST_SIZE] = \
+            digest_function(keyset + key_bytes(keyname))
+    if is_array:
+        return numpy.frombuffer(digests, numpy.uint8).reshape(
+            (len(keys), DIGEST_SIZE))
+    return digests
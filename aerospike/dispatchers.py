@@ -3,14 +3,21 @@
 C backend in an ordered manner. These are meant to be used as
 Mixins.
 '''
-import time
 from six.moves import queue as Queue
 import threading
+import itertools
+import random
 import abc
+from six.moves import range as xrange
 from .logger import logger
 from .decorators import order_call_once
 from functools import partial
-from .constants import MESSAGES
+from .constants import (
+    MESSAGES, ROUTE_ROUND_ROBIN, ROUTE_BY_KEY,
+    RETRY_BACKOFF_MS, RETRY_BACKOFF_MAX_MS, RETRY_TICK_MS, RETRY_WHEEL_SLOTS)
+from .error_codes import (
+    EV2CITRUSLEAF_FAIL_CLIENT_ERROR, EV2CITRUSLEAF_FAIL_THROTTLED)
+from .common import clock
 
 
 class AsyncDispatcherStates(object):
@@ -27,11 +34,12 @@ class AsyncDispatcher(object):
     def __init__(self):
         self.state[AsyncDispatcher] = AsyncDispatcherStates.UNINITIALIZED
 
-    def _pause_event_loop(self):
-        pass
-
-    def _resume_event_loop(self):
-        pass
+    def _on_event_loop_thread(self):
+        '''
+        Are we running on a thread that must never block waiting on
+        its own completions?
+        '''
+        return False
 
     @abc.abstractmethod
     def _setup_async(self):
@@ -59,9 +67,17 @@ class AsyncDispatcher(object):
         pass
 
     @abc.abstractmethod
-    def _submit_work(self, function_ptr, *args):
+    def _route_event_loop(self, routing_key=None):
+        '''
+        Pick the event loop a request should run on. Requests sharing
+        a routing_key should land on the same loop.
+        '''
+        pass
+
+    @abc.abstractmethod
+    def _submit_work(self, event_loop, function_ptr, *args):
         '''In case of the event loop, we'd just call the
-        non blocking function_ptr(*args).
+        non blocking function_ptr(*args) on event_loop.
 
         But in case of the threading shim, we'd have to submit
         the function_ptr and arguments to a queue.
@@ -69,42 +85,157 @@ class AsyncDispatcher(object):
         pass
 
 
+class WorkItem(object):
+    '''
+    A call into the C library waiting on an event loop.
+
+    deadline (in clock() seconds) bounds how long it may keep being
+    retried; expire(work) is called instead once it can't make it, and
+    expire(work, code) once the C library refuses it for good, either
+    way completing it with a failure.
+    '''
+    __slots__ = ('function_ptr', 'args', 'deadline', 'expire', 'attempts')
+
+    def __init__(self, function_ptr, args, deadline=None, expire=None):
+        self.function_ptr = function_ptr
+        self.args = args
+        self.deadline = deadline
+        self.expire = expire
+        self.attempts = 0
+
+
+class RetryWheel(object):
+    '''
+    Hashed timer wheel of work waiting out its backoff.
+
+    Scheduling and expiring are O(1) per item; the owning loop only
+    needs to come around once per tick while anything is pending.
+    '''
+    def __init__(self, tick_ms=RETRY_TICK_MS, slots=RETRY_WHEEL_SLOTS):
+        self.tick = tick_ms / 1000.0
+        self.slots = [[] for _ in xrange(slots)]
+        self.current_tick = int(clock() / self.tick)
+        self.pending = 0
+
+    def schedule(self, work, delay, now):
+        due_tick = int(now / self.tick) + max(1, int(delay / self.tick))
+        self.slots[due_tick % len(self.slots)].append((due_tick, work))
+        self.pending += 1
+
+    def advance(self, now):
+        '''
+        Return the work whose backoff has run out by now.
+        '''
+        current_tick = int(now / self.tick)
+        if not self.pending:
+            self.current_tick = current_tick
+            return ()
+        due = []
+        first_tick = self.current_tick + 1
+        # Past a full revolution every slot gets looked at exactly once.
+        if current_tick - self.current_tick >= len(self.slots):
+            first_tick = current_tick - len(self.slots) + 1
+        for tick in xrange(first_tick, current_tick + 1):
+            slot = self.slots[tick % len(self.slots)]
+            if not slot:
+                continue
+            waiting = []
+            for due_tick, work in slot:
+                if due_tick <= current_tick:
+                    due.append(work)
+                else:
+                    waiting.append((due_tick, work))
+            slot[:] = waiting
+        self.current_tick = current_tick
+        self.pending -= len(due)
+        return due
+
+
+class EventLoop(object):
+    '''
+    One event_base, the thread that runs it, the queue of work
+    waiting to be handed to it and the work waiting to be retried.
+    '''
+    def __init__(self, index, base):
+        self.index = index
+        self.base = base
+        self.queue = Queue.Queue()
+        self.retries = RetryWheel()
+        # when the loopexit armed for the next retry tick fires
+        self.retry_timer_due = 0
+        self.running = threading.Event()
+        # Set while a wakeup has been requested but the loop has not yet
+        # come around to drain the queue. Keeps a burst of submits
+        # down to one event_base_loopexit.
+        self.wakeup_pending = threading.Event()
+        self.thread = None
+
+    def __repr__(self):
+        return 'EventLoop({0})'.format(self.index)
+
+
 class LibEvent(AsyncDispatcher):
     '''
     LibEvent rarely (if ever) changes, so I expect this
     to be a stable API.
+
+    Runs one or more event bases (event_loops=N), each on its own thread
+    with its own queue. The first base also carries the cluster management
+    events and the info calls.
     '''
     def __init__(self, *args, **kwargs):
         super(LibEvent, self).__init__()
-        self._event_loop_thread = None
+        self._event_loops = []
         self._event_loop = None
-        self._event_loop_queue = None
-        self._event_loop_running_toggle = None
-        self.is_full = threading.Event()
+        self._num_event_loops = max(1, kwargs.get('event_loops') or 1)
+        self._event_loop_routing = \
+            kwargs.get('event_loop_routing') or ROUTE_ROUND_ROBIN
+        if self._event_loop_routing not in (ROUTE_ROUND_ROBIN, ROUTE_BY_KEY):
+            raise ValueError(
+                "Unknown event_loop_routing {0!r}".format(
+                    self._event_loop_routing))
+        self._round_robin = itertools.count()
+        self._wake_loop_on_submit = kwargs.get('wake_loop_on_submit', True)
+        self._retry_backoff = \
+            kwargs.get('retry_backoff_ms', RETRY_BACKOFF_MS) / 1000.0
+        self._retry_backoff_max = \
+            kwargs.get('retry_backoff_max_ms', RETRY_BACKOFF_MAX_MS) / 1000.0
+        self._retry_tick = None
 
     @order_call_once(
         AsyncDispatcherStates.UNINITIALIZED,
         new_state=AsyncDispatcherStates.INITIALIZED)
     def _setup_async(self):
-        loop = self.event_base_new()
-        # if libevent was compiled with pthreads,
-        # this will instruct it to place additional locks
-        # in place. I doubt this is needed though, since
-        # we halt the event loop, add work, then begin it again.
+        # Locking has to be switched on *before* the bases are made,
+        # otherwise they have no lock and no notification fd,
+        # and evthread_make_base_notifiable quietly does nothing.
+        # We need both so another thread can kick a loop awake
+        # from _submit_work.
         self.evthread_use_pthreads()
-        self.evthread_make_base_notifiable(loop)
-
-        self._event_loop = loop
-        self._event_loop_queue = Queue.Queue()
-        self._event_loop_running_toggle = threading.Event()
+        for index in xrange(self._num_event_loops):
+            loop = self.event_base_new()
+            self.evthread_make_base_notifiable(loop)
+            self._event_loops.append(EventLoop(index, loop))
+        self._event_loop = self._event_loops[0].base
+        tick = self._event_loops[0].retries.tick
+        self._retry_tick = self.ffi.new(
+            'struct timeval *', [int(tick), int(tick * 1e6) % 1000000])
 
-    def _pause_event_loop(self):
-        # print('pausing')
-        self.is_full.set()
+    def _on_event_loop_thread(self):
+        current_thread = threading.current_thread()
+        for event_loop in self._event_loops:
+            if event_loop.thread is current_thread:
+                return True
+        return False
 
-    def _resume_event_loop(self):
-        # print('resuming')
-        self.is_full.clear()
+    @property
+    def queued(self):
+        '''
+        Return the number of requests submitted but not yet handed
+        to the C library.
+        '''
+        return sum(
+            event_loop.queue.qsize() for event_loop in self._event_loops)
 
     @order_call_once(
         AsyncDispatcherStates.INITIALIZED,
@@ -118,67 +249,153 @@ class LibEvent(AsyncDispatcher):
         We do this to avoid the double dealloc error in Aerospike from calling
         into an active loop.
         '''
-        thread_queue = self._event_loop_queue
-        evt = self._event_loop_running_toggle
-        is_full = self.is_full
-        is_full.clear()
-
-        def run_loop():
-            logger.debug("Starting Event Loop")
-            evt.set()
-            code = 0
-            while evt.is_set():
-                while not is_full.is_set() and not thread_queue.empty():
-                    try:
-                        func_ptr, args = thread_queue.get_nowait()
-                    except Queue.Empty:
-                        break
-                    else:
-                        code = func_ptr(*args)
-                        if code:
-                            if code in (-1, -3):
-                                if code == -1:
-                                    logger.critical(
-                                        "Unable to generate network request"
-                                        " on event loop.")
-                                else:
-                                    logger.critical("Connection throttled.")
-                                thread_queue.put_nowait((func_ptr, args,))
-                            else:
-                                logger.info("Unknown code {0}".format(code))
-                            break
-                code = self.event_base_loop(self._event_loop, 0x01)
-                if code == -1:
-                    logger.critical(
-                        MESSAGES['event_loop_in_trouble'].format(code))
-
-        t = threading.Thread(target=run_loop, args=())
-        t.daemon = True
-        self._event_loop_thread = t
-        t.start()
+        for event_loop in self._event_loops:
+            t = threading.Thread(
+                target=self._run_event_loop, args=(event_loop,),
+                name='aerospike-event-loop-{0}'.format(event_loop.index))
+            t.daemon = True
+            event_loop.thread = t
+            # set before start so a _deactivate_loop that races the
+            # thread start still stops it.
+            event_loop.running.set()
+            t.start()
+
+    def _run_event_loop(self, event_loop):
+        thread_queue = event_loop.queue
+        retries = event_loop.retries
+        evt = event_loop.running
+        wakeup_pending = event_loop.wakeup_pending
+        logger.debug("Starting Event Loop {0}".format(event_loop.index))
+        code = 0
+        while evt.is_set():
+            # Clear before draining: anything submitted after this
+            # point either gets drained below or issues a fresh wakeup.
+            wakeup_pending.clear()
+            now = clock()
+            for work in retries.advance(now):
+                self._run_work(event_loop, work)
+            while not thread_queue.empty():
+                try:
+                    work = thread_queue.get_nowait()
+                except Queue.Empty:
+                    break
+                else:
+                    self._run_work(event_loop, work)
+            # Come back around on the next tick to send whatever
+            # finishes backing off, but only keep one such timer armed.
+            if retries.pending and now >= event_loop.retry_timer_due:
+                event_loop.retry_timer_due = now + retries.tick
+                self.event_base_loopexit(event_loop.base, self._retry_tick)
+            code = self.event_base_loop(event_loop.base, 0x01)
+            if code == -1:
+                logger.critical(
+                    MESSAGES['event_loop_in_trouble'].format(code))
+
+    def _run_work(self, event_loop, work):
+        code = work.function_ptr(*work.args)
+        if code:
+            if code in (EV2CITRUSLEAF_FAIL_CLIENT_ERROR,
+                        EV2CITRUSLEAF_FAIL_THROTTLED):
+                self._retry_work(event_loop, work, code)
+            else:
+                # Nothing will call back for it, so fail it here or its
+                # handle, window slot and any blocked caller are stuck.
+                logger.error(
+                    "Unexpected code {0} submitting work, failing it".format(
+                        code))
+                if work.expire is not None:
+                    work.expire(work, code)
+
+    def _retry_work(self, event_loop, work, code):
+        '''
+        Park work the C library refused on the retry wheel, backing off
+        exponentially (with jitter) per attempt. Work that would
+        only get another go after its deadline is expired instead.
+        '''
+        work.attempts += 1
+        backoff = min(
+            self._retry_backoff_max,
+            self._retry_backoff * (2 ** (work.attempts - 1)))
+        backoff = backoff / 2 + random.uniform(0, backoff / 2)
+        now = clock()
+        if work.deadline is not None and now + backoff >= work.deadline:
+            logger.debug(
+                "Giving up after {0} attempts (code {1})".format(
+                    work.attempts, code))
+            if work.expire is not None:
+                work.expire(work)
+            return
+        if code == EV2CITRUSLEAF_FAIL_CLIENT_ERROR:
+            logger.debug(
+                "Unable to generate network request on event loop, "
+                "retry {0} in {1:.3f}s".format(work.attempts, backoff))
+        else:
+            logger.debug(
+                "Connection throttled, retry {0} in {1:.3f}s".format(
+                    work.attempts, backoff))
+        event_loop.retries.schedule(work, backoff, now)
+
+    def _route_event_loop(self, routing_key=None):
+        event_loops = self._event_loops
+        if len(event_loops) == 1:
+            return event_loops[0]
+        if routing_key is None or \
+                self._event_loop_routing == ROUTE_ROUND_ROBIN:
+            return event_loops[next(self._round_robin) % len(event_loops)]
+        return event_loops[hash(routing_key) % len(event_loops)]
+
+    def _submit_work(self, event_loop, function_ptr, *args):
+        self._submit_work_item(event_loop, WorkItem(function_ptr, args))
 
     @order_call_once(
         AsyncDispatcherStates.INITIALIZED | AsyncDispatcherStates.RUNNING)
-    def _submit_work(self, function_ptr, *args):
-        self._event_loop_queue.put_nowait((function_ptr, args,))
-        # self.event_base_loopexit(self._event_loop, self.ffi.NULL)
+    def _submit_work_item(self, event_loop, work):
+        event_loop.queue.put_nowait(work)
+        if self._wake_loop_on_submit:
+            self._wakeup_loop(event_loop)
+
+    def _wakeup_loop(self, event_loop):
+        '''
+        Make event_base_loop return so the loop drains its queue now,
+        rather than whenever the next network event or timer fires.
+
+        Only the first submit after a drain pays for the notification.
+        '''
+        if not event_loop.wakeup_pending.is_set():
+            event_loop.wakeup_pending.set()
+            self.event_base_loopexit(event_loop.base, self.ffi.NULL)
+
+    @property
+    def event_loop_count(self):
+        '''
+        Return the number of event loops (and threads) this client runs.
+        '''
+        return len(self._event_loops)
 
     @order_call_once(
         AsyncDispatcherStates.INITIALIZED | AsyncDispatcherStates.RUNNING,
         new_state=AsyncDispatcherStates.INITIALIZED)
     def _deactivate_loop(self):
-        self._event_loop_running_toggle.clear()
-        # self.event_base_loopbreak(self._event_loop)
-        self._event_loop_thread = None
+        for event_loop in self._event_loops:
+            event_loop.running.clear()
+            self.event_base_loopexit(event_loop.base, self.ffi.NULL)
+        # Don't let _destruct_async free a base out from under a loop
+        # that is still finishing its last pass.
+        current_thread = threading.current_thread()
+        for event_loop in self._event_loops:
+            if event_loop.thread is not current_thread:
+                event_loop.thread.join()
+            event_loop.thread = None
 
     @order_call_once(
         AsyncDispatcherStates.INITIALIZED,
         new_state=AsyncDispatcherStates.UNINITIALIZED)
     def _destruct_async(self):
-        self.event_base_free(self._event_loop)
+        for event_loop in self._event_loops:
+            self.event_base_free(event_loop.base)
+        self._event_loops = []
         self._event_loop = None
-        self._event_loop_queue = None
-        self._event_loop_running_toggle = None
+        self._retry_tick = None
 
 
 class PThreader(AsyncDispatcher):
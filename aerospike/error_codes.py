@@ -4,6 +4,10 @@ class AerospikeError(ValueError):
 
 FORMAT = "Error Type: {0}, Message: {1}"
 EV2CITRUSLEAF_OK = 0
+EV2CITRUSLEAF_FAIL_CLIENT_ERROR = -1
+EV2CITRUSLEAF_FAIL_TIMEOUT = -2
+EV2CITRUSLEAF_FAIL_THROTTLED = -3
+EV2CITRUSLEAF_FAIL_NOTFOUND = 2
 
 AEROSPIKE2_NONBLOCKING = {
     -1: ("EV2CITRUSLEAF_FAIL_CLIENT_ERROR",
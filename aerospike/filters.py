@@ -2,6 +2,7 @@
 '''
 Convert data types to the Python equivalents.
 '''
+from six.moves import range as xrange
 CL_NULL = 0x00
 CL_INT = 0x01
 CL_FLOAT = 2
@@ -18,8 +19,12 @@ CL_RUBY_BLOB = 10
 CL_UNKNOWN = 666666
 
 
+# not ffi.string: that would stop at the first NUL of a binary value
 convert_to_str = \
-    lambda bin, ffi: ffi.string(bin.object.u.str, bin.object.size)
+    lambda bin, ffi: ffi.buffer(bin.object.u.str, bin.object.size)[:]
+
+convert_to_bytes = \
+    lambda bin, ffi: ffi.buffer(bin.object.u.blob, bin.object.size)[:]
 
 void_ptr = \
     lambda bin, ffi: bin
@@ -43,7 +48,7 @@ EXTRACT_METHODS = {
     CL_STR: convert_to_str,
     CL_TIMESTAMP: convert_to_str,
     CL_DIGEST: void_ptr,
-    CL_BLOB: void_ptr,
+    CL_BLOB: convert_to_bytes,
     CL_JAVA_BLOB: void_ptr,
     CL_CSHARP_BLOB: void_ptr,
     CL_PYTHON_BLOB: void_ptr,
@@ -52,6 +57,25 @@ EXTRACT_METHODS = {
 }
 
 
+def copy_blob(bin, ffi):
+    '''
+    The bytes of a bin void_ptr would hand out, for when the bins are
+    freed before anyone looks at them.
+    '''
+    if not bin.object.size:
+        return b''
+    return convert_to_bytes(bin, ffi)
+
+
+# EXTRACT_METHODS as a tuple indexed by type, for decode_bins
+DECODERS = tuple(
+    EXTRACT_METHODS.get(bin_type, void_ptr)
+    for bin_type in xrange(CL_RUBY_BLOB + 1))
+# DECODERS copying out whatever they would have pointed into
+OWNED_DECODERS = tuple(
+    copy_blob if decoder is void_ptr else decoder for decoder in DECODERS)
+
+
 def get_value(bin, bin_type, ffi):
     return EXTRACT_METHODS[bin_type](bin, ffi)
 
@@ -62,6 +86,43 @@ def get_bin_name(bin, ffi):
     return ffi.string(bin.bin_name, 32)
 
 
+def decode_bins(bins_ptr, n_bins, ffi, wanted=None, owned=False):
+    '''
+    Return ([bin names], [values]) of n_bins bins in one pass, skipping
+    (without decoding) any bin not in wanted, if given.
+
+    Same results as get_bin_name/get_value, minus a dict lookup and two
+    calls per bin: ints and strings are decoded inline, the rest through
+    DECODERS. owned=True copies out (as bytes) the values that would
+    otherwise point into the bins, for results that outlive them.
+    '''
+    string = ffi.string
+    buffer = ffi.buffer
+    decoders = OWNED_DECODERS if owned else DECODERS
+    fallback = copy_blob if owned else void_ptr
+    num_decoders = len(decoders)
+    names = []
+    values = []
+    for index in xrange(n_bins):
+        bin = bins_ptr[index]
+        name = string(bin.bin_name, 32)
+        if wanted is not None and name not in wanted:
+            continue
+        object = bin.object
+        bin_type = object.type
+        if bin_type == CL_INT:
+            value = object.u.i64
+        elif bin_type == CL_STR:
+            value = buffer(object.u.str, object.size)[:]
+        elif 0 <= bin_type < num_decoders:
+            value = decoders[bin_type](bin, ffi)
+        else:
+            value = fallback(bin, ffi)
+        names.append(name)
+        values.append(value)
+    return names, values
+
+
 def type_filter(type_id, ffi):
     def test_type(bin):
         return bin and bin.object and bin.object.type == type_id
@@ -12,23 +12,32 @@ from .operations import (
     DigestOperations,
     UserDefinedFunctionsOperations,
 )
-from .data_types import (Digest)
+from .data_types import (
+    Digest, Key, KeyPipeline, Record, shift_key_arguments)
 from .implementations import register
 from . import constants
-from .constants import DEFAULT_TIMEOUT_MS
-from .dispatchers import LibEvent, AsyncDispatcherStates
+from .constants import DEFAULT_TIMEOUT_MS, BACKPRESSURE_WOULD_BLOCK
+from .dispatchers import LibEvent, AsyncDispatcherStates, WorkItem, clock
 from .decorators import order_call_once, inherit_docstrings
-from .common import StateError, Base, Constructor
+from .common import (
+    StateError, Base, Constructor, BackpressureError, WOULD_BLOCK,
+    InternCache)
+from .completion import run_callback
 from . import filters
 from . import error_codes
+from . import digests as python_digests
 from .logger import logger
 import six
 import struct
+import threading
 from six.moves import range as xrange
 
 VERSION = (constants.AEROSPIKE_2, constants.NONBLOCKING)
 CHECKIN_OBJ_FAILURE = \
     "Object checked into {0} pool is not correct type!"
+EV2GETMANYCALLBACK = \
+    ("void (*)(int result, ev2citrusleaf_rec *recs, int n_recs, "
+     "void *udata)")
 EV2CALLBACK = \
     ("void(*)(int return_value,  ev2citrusleaf_bin *bins, "
      "int n_bins, uint32_t generation, uint32_t expiration, "
@@ -138,15 +147,162 @@ class AS2Constructor(Constructor):
         except Exception:
             raise
         self._destruct_async()
+        if self._owns_dispatcher:
+            self.completion_dispatcher.shutdown()
+
+
+class AS2KeyPipeline(KeyPipeline):
+    '''
+    A KeyPipeline run with ev2citrusleaf_operate.
+
+    The AS2 C client only knows CL_OP_WRITE, CL_OP_READ and CL_OP_ADD,
+    so append and prepend raise ValueError. Nor can it ask for
+    update-only: the server creates a missing record on the first write,
+    so create_key_if_missing must be True. A pipeline that writes reads
+    a key it just created as a record without bins instead of failing
+    with EV2CITRUSLEAF_FAIL_NOTFOUND; one that only reads still fails.
+    '''
+    def __init__(self, client, *args, **kwargs):
+        KeyPipeline.__init__(self, *args, **kwargs)
+        if not self.create_key_if_missing:
+            raise ValueError(
+                ("ev2citrusleaf_operate always creates a missing key, "
+                 "create_key_if_missing must be True"))
+        self.client = client
+
+    def append(self, bin_name, value):
+        raise ValueError(
+            "Unsupported operation append, ev2citrusleaf_operate cannot "
+            "append")
+
+    def prepend(self, bin_name, value):
+        raise ValueError(
+            "Unsupported operation prepend, ev2citrusleaf_operate cannot "
+            "prepend")
+
+    def execute(self, callback, write_parameters=None,
+                timeout_ms=DEFAULT_TIMEOUT_MS):
+        client = self.client
+        ffi = client.ffi
+        if not self.operations:
+            raise ValueError(
+                "No operations to execute (touch needs a write)!")
+        if self.expiration is not None:
+            write_parameters = dict(write_parameters or {})
+            write_parameters.setdefault('expiration', self.expiration)
+        ops = ffi.new('ev2citrusleaf_operation[]', len(self.operations))
+        buffers = []
+        try:
+            for index, (operation, bin_name, value) in \
+                    enumerate(self.operations):
+                op = ops[index]
+                op.bin_name = client._bin_names.get(bin_name)
+                op.op = client._operation_types[operation]
+                if isinstance(value, six.text_type):
+                    value = value.encode('utf8')
+                if operation == self.INCR and \
+                        not isinstance(value, six.integer_types):
+                    raise ValueError(
+                        "Can only incr {0} by an integer!".format(bin_name))
+                try:
+                    init_func = client.bin_init_funcs[type(value)]
+                except KeyError:
+                    raise ValueError(
+                        "Unsupported type {0} for value of key {1}".format(
+                            type(value), bin_name))
+                buffers.append(init_func(ffi.addressof(op, 'object'), value))
+        except Exception:
+            self._free_operations(ops)
+            raise
+
+        if isinstance(self.namespace, Key):
+            prepared = client._prepared_key(self.namespace)
+            routing_key = self.namespace
+            namespace_ptr, keyset_ptr, key_ptr = \
+                prepared.namespace, prepared.keyset, prepared.key
+        else:
+            prepared = None
+            routing_key = (self.namespace, self.keyset, self.key_identifier)
+            namespace_ptr = client._names.get(self.namespace)
+            keyset_ptr = client._names.get(self.keyset)
+            key_ptr = client._prepare_key(self.key_identifier)
+        write_parameters_ptr = \
+            client._checkout_write_parameters(write_parameters)
+        callback = client._after_write(
+            client._read_key(self.namespace, self.keyset, self.key_identifier),
+            callback)
+        # only a write creates the key, a read-only pipeline's NOTFOUND
+        # is the caller's to see
+        creates = self.create_key_if_missing and any(
+            operation != self.READ for operation, _, _ in self.operations)
+
+        def executed(code, bins, generation, expiration):
+            # operate has copied the values out by now
+            self._free_operations(ops)
+            if code is not None and creates and \
+                    code[0] == error_codes.EV2CITRUSLEAF_FAIL_NOTFOUND:
+                code = None
+                if client._record_results:
+                    bins = Record((), (), generation, expiration)
+                else:
+                    bins = {}
+            client._dispatched(callback)(code, bins, generation, expiration)
+        # free the operations on the event loop, dispatch only callback
+        executed.run_inline = True
+        try:
+            result = client._submit_request(
+                executed,
+                (prepared or key_ptr, ops, write_parameters_ptr, buffers),
+                routing_key,
+                client.ev2citrusleaf_operate,
+                client._cluster, namespace_ptr, keyset_ptr, key_ptr,
+                ops, len(self.operations), write_parameters_ptr, timeout_ms)
+        except Exception:
+            # never accepted, executed won't be called
+            self._free_operations(ops)
+            raise
+        if result is WOULD_BLOCK:
+            self._free_operations(ops)
+        return result
+
+    def _free_operations(self, ops):
+        for op in ops:
+            self.client.ev2citrusleaf_object_free(
+                self.client.ffi.addressof(op, 'object'))
+
+
+@inherit_docstrings
+class AS2OperatorOperations(OperatorOperations):
+    def __init__(self, *args, **kwargs):
+        library = self._primary_library
+        self._operation_types = {
+            KeyPipeline.INCR: library.CL_OP_ADD,
+            KeyPipeline.READ: library.CL_OP_READ,
+            KeyPipeline.WRITE: library.CL_OP_WRITE,
+        }
+
+    def key_pipeline(self, namespace, keyset=None, key_identifier=None,
+                     create_key_if_missing=True):
+        if isinstance(namespace, Key):
+            create_key_if_missing, = shift_key_arguments(
+                keyset, key_identifier,
+                ('create_key_if_missing', create_key_if_missing, True))
+            keyset = key_identifier = None
+        return AS2KeyPipeline(
+            self, namespace, keyset, key_identifier, create_key_if_missing)
 
 
 @inherit_docstrings
 class AS2KeyOperations(KeyOperations):
     def __init__(self, *args, **kwargs):
         # prepare callback handlers
+        # type -> f(ev2citrusleaf_object *, value), returning whatever
+        # must be kept alive for as long as the object is in use.
         self.bin_init_funcs = {
             int: self.ev2citrusleaf_object_init_int,
-            bytes: self.ev2citrusleaf_object_dup_str,
+            bytes: self._init_str_object,
+            bytearray: self._init_blob_object,
+            memoryview: self._init_blob_object,
             type(None): lambda obj, value: self.ev2citrusleaf_object_init(obj),
         }
         try:
@@ -155,119 +311,155 @@ class AS2KeyOperations(KeyOperations):
             # Clearly Python 3...
             pass
 
-    def select_key(self, callback, namespace, keyset, key_identifier,
-                   timeout_ms=DEFAULT_TIMEOUT_MS, *named_bins_to_return):
-        if not isinstance(namespace, six.binary_type):
-            namespace = namespace.encode('utf8')
-        if not isinstance(keyset, six.binary_type):
-            keyset = keyset.encode('utf8')
-        key_container = self._prepare_key(key_identifier)
+    def _init_str_object(self, obj, value):
+        '''
+        Point obj at value's memory as a string; nothing is copied and,
+        unlike dup_str, NULs are kept.
+        '''
+        buffer = self.ffi.from_buffer(value)
+        self.ev2citrusleaf_object_init_str2(obj, buffer, len(buffer))
+        return buffer
 
-        num_bins = len(named_bins_to_return)
-        bins_ptr = self.ffi.new('char *', num_bins)
-        bins_items = [self.ffi.new('char[]', bin_name)
-                      for bin_name in named_bins_to_return]
-        for index, named_bin_ptr in enumerate(bins_items):
-            bins_ptr[index] = named_bin_ptr
+    def _init_blob_object(self, obj, value):
+        '''
+        Point obj at value's memory as a blob, without a copy. Don't
+        touch a bytearray until its write has called back.
+        '''
+        buffer = self.ffi.from_buffer(value)
+        self.ev2citrusleaf_object_init_blob(obj, buffer, len(buffer))
+        return buffer
 
-        cuid = self._async_checkin(
-            callback, [key_container, bins_items, bins_ptr])
-        self._submit_work(
+    def select_key(self, callback, namespace, keyset=None,
+                   key_identifier=None, bin_names=None,
+                   timeout_ms=DEFAULT_TIMEOUT_MS):
+        '''
+        Expects callback of form: f(error_code, bins, generation, expiration)
+        '''
+        if isinstance(namespace, Key):
+            bin_names, timeout_ms = shift_key_arguments(
+                keyset, key_identifier,
+                ('bin_names', bin_names, None),
+                ('timeout_ms', timeout_ms, DEFAULT_TIMEOUT_MS))
+        projection = self._projection(bin_names)
+        if isinstance(namespace, Key):
+            prepared = self._prepared_key(namespace, digest=True)
+            return self._submit_call(
+                self._handle_projection_callback, self._expire_request,
+                callback, [prepared, projection], namespace,
+                self.ev2citrusleaf_get_digest,
+                self._cluster, prepared.namespace, prepared.digest,
+                projection.array, len(projection), timeout_ms)
+        namespace_ptr = self._names.get(namespace)
+        keyset_ptr = self._names.get(keyset)
+        key_container = self._prepare_key(key_identifier)
+        return self._submit_call(
+            self._handle_projection_callback, self._expire_request,
+            callback, [key_container, projection],
+            (namespace, keyset, key_identifier),
             self.ev2citrusleaf_get,
-            self._cluster, namespace, keyset, key_container,
-            bins_ptr, num_bins, timeout_ms, self._handle_event_callback, cuid,
-            self._event_loop)
+            self._cluster, namespace_ptr, keyset_ptr, key_container,
+            projection.array, len(projection), timeout_ms)
 
-    def get_key(self, callback, namespace, keyset,
-                key_identifier, timeout_ms=DEFAULT_TIMEOUT_MS):
+    def get_key(self, callback, namespace, keyset=None,
+                key_identifier=None, timeout_ms=DEFAULT_TIMEOUT_MS):
         '''
         Expects callback of form: f(error_code, bins, generation, expiration)
         '''
-        if not isinstance(namespace, bytes):
-            namespace = namespace.encode('utf8')
-        if not isinstance(keyset, bytes):
-            keyset = keyset.encode('utf8')
+        if isinstance(namespace, Key):
+            timeout_ms, = shift_key_arguments(
+                keyset, key_identifier,
+                ('timeout_ms', timeout_ms, DEFAULT_TIMEOUT_MS))
+            keyset = key_identifier = None
+        if self._coalesce_reads:
+            return self._coalesce(
+                self._read_key(namespace, keyset, key_identifier),
+                self._get_key, callback,
+                namespace, keyset, key_identifier, timeout_ms)
+        return self._get_key(
+            callback, namespace, keyset, key_identifier, timeout_ms)
+
+    def _get_key(self, callback, namespace, keyset, key_identifier,
+                 timeout_ms):
+        if isinstance(namespace, Key):
+            # Read by digest, nothing to prepare per call.
+            prepared = self._prepared_key(namespace, digest=True)
+            return self._submit_request(
+                callback, [prepared], namespace,
+                self.ev2citrusleaf_get_all_digest,
+                self._cluster, prepared.namespace, prepared.digest,
+                timeout_ms)
+        namespace_ptr = self._names.get(namespace)
+        keyset_ptr = self._names.get(keyset)
         # Get me an ev2citrusleaf_object pointer
         query_ptr = self._prepare_key(key_identifier)
-        # Get me a uniq id and signal we want to hold
-        # the query_ptr (avoid a GC)
+        # Get me a uniq id, signal we want to hold
+        # the query_ptr (avoid a GC) and send the work off
+        # to the event loop.
         # Question:
         # 1. Since we strcopy the encoded_key_pair into the
         #    ev2citrusleaf_object, can we let it be gc'ed?
-        cuid = self._async_checkin(
-            callback, [query_ptr])
-        # Send the work off to the event loop.
-        self._submit_work(
+        return self._submit_request(
+            callback, [query_ptr],
+            (namespace, keyset, key_identifier),
             self.ev2citrusleaf_get_all,
-            self._cluster, namespace, keyset, query_ptr,
-            timeout_ms, self._handle_event_callback, cuid,
-            self._event_loop)
+            self._cluster, namespace_ptr, keyset_ptr, query_ptr,
+            timeout_ms)
 
-    def put_key(self, callback, namespace, keyset,
-                key_identifier, write_parameters=None,
+    def put_key(self, callback, namespace, keyset=None,
+                key_identifier=None, write_parameters=None,
                 timeout_ms=DEFAULT_TIMEOUT_MS, **bin_names_to_values):
-        if not isinstance(namespace, bytes):
-            namespace = namespace.encode('utf8')
-        if not isinstance(keyset, bytes):
-            keyset = keyset.encode('utf8')
         if not bin_names_to_values:
             raise ValueError("No bins detected!")
+        if isinstance(namespace, Key):
+            write_parameters, timeout_ms = shift_key_arguments(
+                keyset, key_identifier,
+                ('write_parameters', write_parameters, None),
+                ('timeout_ms', timeout_ms, DEFAULT_TIMEOUT_MS))
+            # Written by key, not digest, so the record keeps its set.
+            prepared = self._prepared_key(namespace)
+            routing_key = namespace
+            namespace_ptr, keyset_ptr, query_ptr = \
+                prepared.namespace, prepared.keyset, prepared.key
+        else:
+            prepared = None
+            routing_key = (namespace, keyset, key_identifier)
+            namespace_ptr = self._names.get(namespace)
+            keyset_ptr = self._names.get(keyset)
+            query_ptr = self._prepare_key(key_identifier)
 
-        query_ptr = self._prepare_key(key_identifier)
-
-        num_bins = len(bin_names_to_values)
-        bins = self.ffi.new('ev2citrusleaf_bin[]', num_bins)
-        size_of_bin_name = self.ffi.sizeof(bins[0].bin_name) - 1
-        for index, (key, value) in enumerate(bin_names_to_values.items()):
-            length = len(key)
-            if isinstance(value, six.string_types) and \
-                    not isinstance(value, bytes):
-                try:
-                    value = value.encode('utf8')
-                except UnicodeEncodeError:
-                    raise UnicodeEncodeError(
-                        ("Unable to convert value for bin "
-                         "key {0} to bytes!").format(key))
-            if isinstance(key, six.string_types) and \
-                    not isinstance(key, bytes):
-                try:
-                    key = key.encode('utf8')
-                except UnicodeEncodeError:
-                    raise UnicodeEncodeError(
-                        ("Unable to convert key for bin "
-                         "key {0} to bytes!").format(key))
-
-            if length > size_of_bin_name:
-                raise ValueError(
-                    "{0} too large a bin name to fit into {1} bytes!".format(
-                        key, size_of_bin_name))
-            bins[index].bin_name[0:length] = key
-            try:
-                self.bin_init_funcs[type(value)](
-                    self.ffi.addressof(bins[index].object), value)
-            except KeyError:
-                raise ValueError(
-                    "Unsupported type {0} for value of key {1}".format(
-                        type(value), key))
+        bins, num_bins, buffers = self._prepare_bins(bin_names_to_values)
         write_parameters_ptr = \
             self._checkout_write_parameters(write_parameters)
-        cuid = self._async_checkin(
-            callback,
-            (query_ptr, bins,
-             write_parameters_ptr,))
-        self._submit_work(
+        return self._submit_request(
+            self._after_write(
+                self._read_key(namespace, keyset, key_identifier), callback),
+            (prepared or query_ptr, bins,
+             write_parameters_ptr, buffers),
+            routing_key,
             self.ev2citrusleaf_put,
-            self._cluster, namespace, keyset, query_ptr,
+            self._cluster, namespace_ptr, keyset_ptr, query_ptr,
             bins, num_bins, write_parameters_ptr,
-            timeout_ms, self._handle_event_callback, cuid, self._event_loop)
+            timeout_ms)
 
-    def remove_key(self, callback, namespace, keyset,
-                   key_identifier, write_parameters=None,
+    def remove_key(self, callback, namespace, keyset=None,
+                   key_identifier=None, write_parameters=None,
                    timeout_ms=DEFAULT_TIMEOUT_MS):
-        if not isinstance(namespace, bytes):
-            namespace = namespace.encode('utf8')
-        if not isinstance(keyset, bytes):
-            keyset = keyset.encode('utf8')
+        if isinstance(namespace, Key):
+            write_parameters, timeout_ms = shift_key_arguments(
+                keyset, key_identifier,
+                ('write_parameters', write_parameters, None),
+                ('timeout_ms', timeout_ms, DEFAULT_TIMEOUT_MS))
+            prepared = self._prepared_key(namespace, digest=True)
+            write_parameters_ptr = \
+                self._checkout_write_parameters(write_parameters)
+            return self._submit_request(
+                self._after_write(self._read_key(namespace), callback),
+                (prepared, write_parameters_ptr,), namespace,
+                self.ev2citrusleaf_delete_digest,
+                self._cluster, prepared.namespace, prepared.digest,
+                write_parameters_ptr, timeout_ms)
+        namespace_ptr = self._names.get(namespace)
+        keyset_ptr = self._names.get(keyset)
         # Use the _prepare_key function to coerce key_identifier to
         # a container!
         key_ptr = \
@@ -280,15 +472,67 @@ class AS2KeyOperations(KeyOperations):
         write_parameters_ptr = \
             self._checkout_write_parameters(write_parameters)
 
-        cuid = self._async_checkin(
-            callback, (key_ptr,
-                       write_parameters_ptr,))
-        self._submit_work(
+        return self._submit_request(
+            self._after_write(
+                self._read_key(namespace, keyset, key_identifier), callback),
+            (key_ptr, write_parameters_ptr,),
+            (namespace, keyset, key_identifier),
             self.ev2citrusleaf_delete,
-            self._cluster, namespace, keyset, key_ptr,
-            write_parameters_ptr, timeout_ms,
-            self._handle_event_callback, cuid,
-            self._event_loop)
+            self._cluster, namespace_ptr, keyset_ptr, key_ptr,
+            write_parameters_ptr, timeout_ms)
+
+
+class AS2PreparedKey(object):
+    '''
+    The C side of a Key: namespace and set char[]s, an
+    ev2citrusleaf_object for the key name and, once calculated,
+    its cf_digest.
+
+    These belong to the Key, not the object pools; the key name is
+    pointed at (init_str) rather than copied (dup_str), so nothing needs
+    freeing.
+    '''
+    __slots__ = ('ffi', 'namespace', 'keyset', 'key', 'key_buffer', 'digest')
+
+    def __init__(self, client, key):
+        ffi = client.ffi
+        self.ffi = ffi
+        self.namespace = client._names.get(key.namespace)
+        self.keyset = client._names.get(key.set)
+        self.key = ffi.new('ev2citrusleaf_object *')
+        self.key_buffer = None
+        self.digest = None
+        user_key = key.user_key
+        if isinstance(user_key, six.integer_types):
+            client.ev2citrusleaf_object_init_int(self.key, user_key)
+            return
+        if isinstance(user_key, six.text_type):
+            user_key = user_key.encode('utf8')
+        elif not isinstance(user_key, six.binary_type):
+            raise ValueError(
+                ("Unsupported key type! "
+                 "Must be a numeric, unicode string or bytes!"))
+        self.key_buffer = ffi.new('char[]', user_key)
+        client.ev2citrusleaf_object_init_str(self.key, self.key_buffer)
+
+
+class AS2Projection(object):
+    '''
+    The bins a projected read asks for: the char *[] of names
+    ev2citrusleaf_get(_digest) takes (array, pointing into names) and
+    the set of names to decode once the record is back (wanted).
+    '''
+    __slots__ = ('array', 'names', 'wanted')
+
+    def __init__(self, client, bin_names):
+        self.names = [client._names.get(name) for name in bin_names]
+        self.array = client.ffi.new('char *[]', self.names)
+        self.wanted = frozenset(
+            name if isinstance(name, six.binary_type) else
+            name.encode('utf8') for name in bin_names)
+
+    def __len__(self):
+        return len(self.names)
 
 
 @inherit_docstrings
@@ -301,12 +545,38 @@ class AS2Base(Base):
             self.ffi.typeof('ev2citrusleaf_write_parameters *')
         self._ev2citrusleaf_digest_type = \
             self.ffi.typeof('cf_digest *')
+        self._ev2citrusleaf_bins_type = \
+            self.ffi.typeof('ev2citrusleaf_bin[]')
+        # size class -> ev2citrusleaf_bin[size class]
+        self._bin_array_types = dict(
+            (size, self.ffi.typeof('ev2citrusleaf_bin[{0}]'.format(size)))
+            for size in constants.BIN_ARRAY_SIZE_CLASSES)
+        # Namespaces, sets (and projected bin names) -> char[],
+        # bin names to write -> ev2citrusleaf_bin_name
+        self._names = InternCache(
+            self._encode_name, constants.INTERN_CACHE_SIZE)
+        self._bin_names = InternCache(
+            self._encode_bin_name, constants.INTERN_CACHE_SIZE)
+        # tuples of bin names -> AS2Projection
+        self._projections = InternCache(
+            lambda bin_names: AS2Projection(self, bin_names),
+            constants.INTERN_CACHE_SIZE)
+        # bin names read back, so Records with the same bins share them
+        self._record_names = InternCache(tuple, constants.INTERN_CACHE_SIZE)
+        # read_key -> callbacks waiting on that read, see _coalesce
+        self._reads_in_flight = {}
+        self._reads_lock = threading.Lock()
+        self._handle_projection_callback = \
+            self.ffi.callback(EV2CALLBACK, self._handle_projection_callback)
         # map types to check in functions.
         self._common_checkin_funcs = {
             self._ev2citrusleaf_obj_type: self._checkin_ev2citrusleaf_obj,
             self._ev2write_parameters_type: self._checkin_write_parameters,
-            self._ev2citrusleaf_digest_type: self._checkin_digest_container
+            self._ev2citrusleaf_digest_type: self._checkin_digest_container,
+            self._ev2citrusleaf_bins_type: self._checkin_bin_array,
         }
+        for bins_type in self._bin_array_types.values():
+            self._common_checkin_funcs[bins_type] = self._checkin_bin_array
         self._handle_event_callback = \
             self.ffi.callback(EV2CALLBACK, self._handle_event_callback)
         self.NO_LOGGING = self._primary_library.CF_NO_LOGGING
@@ -324,17 +594,91 @@ class AS2Base(Base):
             raise ValueError("Cannot coerce to a number.")
         self._primary_library.g_log_level = level
 
-    def _handle_event_callback(
-            self, return_value,  bins_ptr, n_bins,
-            generation_val, expiration_val, udata_ptr):
-        uid_cast = self.ffi.cast('char *', udata_ptr)
-        id = self.ffi.string(uid_cast)
-        callback, refs_to_hold = self._async_complete(id)
+    def _submit_request(self, callback, refs_to_hold, routing_key,
+                        function_ptr, *args):
+        '''
+        Check a record request in and hand it to an event loop.
+
+        Every ev2citrusleaf record call ends with
+        (..., timeout_ms, callback, udata, event_base); args runs up to
+        and including timeout_ms and the rest is filled in here once
+        routing_key has picked the event loop.
+
+        If the C library refuses the call it is retried until timeout_ms
+        runs out, then the callback gets EV2CITRUSLEAF_FAIL_TIMEOUT.
+        '''
+        return self._submit_call(
+            self._handle_event_callback, self._expire_request,
+            callback, refs_to_hold, routing_key, function_ptr, *args)
+
+    def _submit_call(self, c_callback, expire, callback, refs_to_hold,
+                     routing_key, function_ptr, *args):
+        '''
+        _submit_request for calls whose C callback (c_callback) isn't
+        an ev2citrusleaf_callback. expire(work, code) must complete the
+        request with code (EV2CITRUSLEAF_FAIL_TIMEOUT when it runs out
+        of time).
+        '''
+        timeout_ms = args[-1]
+        deadline = clock() + timeout_ms / 1000.0
+        event_loop = self._route_event_loop(routing_key)
+        try:
+            cuid = self._async_checkin(
+                callback, refs_to_hold, event_loop.index, timeout_ms)
+        except BackpressureError:
+            self._release_references(refs_to_hold)
+            if self._backpressure_policy == BACKPRESSURE_WOULD_BLOCK:
+                return WOULD_BLOCK
+            raise
+        self._submit_work_item(event_loop, WorkItem(
+            function_ptr,
+            args + (c_callback, cuid, event_loop.base),
+            deadline, expire))
+
+    def _expire_request(self, work,
+                        code=error_codes.EV2CITRUSLEAF_FAIL_TIMEOUT):
+        '''
+        Fail a request that never got accepted by the C library (by
+        default timing it out), as if the library itself had failed it.
+        '''
+        udata_ptr = work.args[-2]
+        AS2Base._handle_event_callback(
+            self, code, self.ffi.NULL, 0, 0, 0, udata_ptr)
+
+    def _release_references(self, refs_to_hold):
+        '''
+        Check any pooled C objects held for a request back into
+        the generic_pool.
+        '''
         for item in (x for x in refs_to_hold if isinstance(x, self.ffi.CData)):
             typeof = self.ffi.typeof(item)
             if typeof in self._common_checkin_funcs:
                 self._common_checkin_funcs[typeof](item)
 
+    def _handle_event_callback(
+            self, return_value,  bins_ptr, n_bins,
+            generation_val, expiration_val, udata_ptr):
+        callback, refs_to_hold = self._async_complete(udata_ptr)
+        self._release_references(refs_to_hold)
+        self._complete_record(
+            callback, return_value, bins_ptr, n_bins,
+            generation_val, expiration_val)
+
+    def _handle_projection_callback(
+            self, return_value,  bins_ptr, n_bins,
+            generation_val, expiration_val, udata_ptr):
+        '''
+        _handle_event_callback for projected reads, refs_to_hold ending
+        with the AS2Projection asked for.
+        '''
+        callback, refs_to_hold = self._async_complete(udata_ptr)
+        self._release_references(refs_to_hold)
+        self._complete_record(
+            callback, return_value, bins_ptr, n_bins,
+            generation_val, expiration_val, refs_to_hold[-1].wanted)
+
+    def _complete_record(self, callback, return_value, bins_ptr, n_bins,
+                         generation_val, expiration_val, wanted=None):
         bins = None
         try:
             code = None
@@ -343,15 +687,12 @@ class AS2Base(Base):
                     (return_value,
                      error_codes.aerospike_2_non_blocking_format_error(
                          return_value),)
-            bins = {}
-            for bin in (bins_ptr[index] for index in xrange(n_bins)):
-                bins[filters.get_bin_name(bin, self.ffi)] = \
-                    filters.get_value(
-                        bin, bin.object.type, self.ffi)
-                # You Do NOT need to free memory here, because
-                # the finally clause does it for you.
-                # Add in a manual dealloc and you will suffer double free
-                # errors!
+            bins = self._decode_bins(
+                bins_ptr, n_bins, wanted, generation_val, expiration_val)
+            # You Do NOT need to free memory here, because
+            # the finally clause does it for you.
+            # Add in a manual dealloc and you will suffer double free
+            # errors!
             return None
         except Exception:
             logger.exception(
@@ -361,6 +702,136 @@ class AS2Base(Base):
                 code, bins, generation_val, expiration_val)
             self.ev2citrusleaf_bins_free(bins_ptr, n_bins)
 
+    def _coalesce(self, read_key, submit, callback, *args):
+        '''
+        submit(callback, *args) a read (get_key/get_digest), unless an
+        identical one (by read_key) is already in flight; then callback
+        waits for that one's result instead, timeout and all.
+
+        Should the read never make it to the event loop (submit raising
+        or returning WOULD_BLOCK), its caller hears about it as ever and
+        everyone who joined it in the meantime is called back with
+        EV2CITRUSLEAF_FAIL_CLIENT_ERROR (EV2CITRUSLEAF_FAIL_THROTTLED for
+        WOULD_BLOCK).
+        '''
+        reads_in_flight = self._reads_in_flight
+        with self._reads_lock:
+            waiting = reads_in_flight.get(read_key)
+            if waiting is not None:
+                waiting.append(callback)
+                return None
+            waiting = reads_in_flight[read_key] = [callback]
+
+        def fan_out(code, bins, generation, expiration):
+            self._end_read(read_key, waiting)
+            # every caller gets bins (a dict or Record) of their own
+            copies = [bins] + [
+                bins if bins is None else bins.copy()
+                for _ in xrange(len(waiting) - 1)]
+            for callback, bins in zip(waiting, copies):
+                run_callback(
+                    self._dispatched(callback),
+                    (code, bins, generation, expiration))
+        # only the fanned out callbacks are for the dispatcher
+        fan_out.run_inline = True
+
+        try:
+            result = submit(fan_out, *args)
+        except Exception:
+            self._abandon_read(
+                read_key, waiting, error_codes.EV2CITRUSLEAF_FAIL_CLIENT_ERROR)
+            raise
+        if result is WOULD_BLOCK:
+            self._abandon_read(
+                read_key, waiting, error_codes.EV2CITRUSLEAF_FAIL_THROTTLED)
+        return result
+
+    def _end_read(self, read_key, waiting=None):
+        '''
+        Stop read_key's callbacks (waiting, if given, else whichever
+        are in flight) from being joined.
+        '''
+        with self._reads_lock:
+            if waiting is None or \
+                    self._reads_in_flight.get(read_key) is waiting:
+                self._reads_in_flight.pop(read_key, None)
+
+    @staticmethod
+    def _read_key(namespace, keyset=None, key_identifier=None):
+        '''
+        What _coalesce tells reads of a key apart by, a Key or not.
+        '''
+        if isinstance(namespace, Key):
+            return namespace.namespace, namespace.set, namespace.user_key
+        return namespace, keyset, key_identifier
+
+    @staticmethod
+    def _digest_read_key(namespace, digest):
+        return namespace, (digest.raw if isinstance(digest, Digest)
+                           else bytes(bytearray(digest)))
+
+    def _after_write(self, read_key, callback):
+        '''
+        Return what to call back a write to read_key with. With
+        coalesce_reads, the read in flight for read_key (if any) takes
+        on no more callers once the write is done, so a read made after
+        the write has called back never gets an older result.
+        '''
+        if not self._coalesce_reads:
+            return callback
+
+        def written(*args):
+            self._end_read(read_key)
+            self._dispatched(callback)(*args)
+        written.run_inline = True
+        return written
+
+    def _abandon_read(self, read_key, waiting, return_value):
+        self._end_read(read_key, waiting)
+        code = (return_value,
+                error_codes.aerospike_2_non_blocking_format_error(
+                    return_value),)
+        for callback in waiting[1:]:
+            run_callback(self._dispatched(callback), (code, None, 0, 0))
+
+    def _decode_bins(self, bins_ptr, n_bins, wanted=None,
+                     generation=0, expiration=0):
+        '''
+        Return {bin name: value}, or a Record if the client was made with
+        record_results, skipping (without decoding) any bin not in
+        wanted, if given.
+
+        A dispatched (or asyncio) callback runs after the bins are
+        freed, so then nothing may point into them.
+        '''
+        names, values = filters.decode_bins(
+            bins_ptr, n_bins, self.ffi, wanted, self._owned_values)
+        if not self._record_results:
+            return dict(zip(names, values))
+        return Record(
+            self._record_names.get(tuple(names)), tuple(values),
+            generation, expiration)
+
+    def _prepared_key(self, key, digest=False):
+        '''
+        Return the AS2PreparedKey kept on a Key, preparing it on first
+        use (and its digest, when asked for).
+
+        Two threads racing here each prepare one and the last one
+        stays; every request holds on to the one it was given.
+        '''
+        prepared = key._prepared
+        if prepared is None or prepared.ffi is not self.ffi:
+            prepared = AS2PreparedKey(self, key)
+            key._prepared = prepared
+        if digest and prepared.digest is None:
+            digest_ptr = self.ffi.new('cf_digest *')
+            if self.ev2citrusleaf_calculate_digest(
+                    prepared.keyset, prepared.key, digest_ptr) == -1:
+                raise ValueError("Unknown data type for key!")
+            prepared.digest = digest_ptr
+        return prepared
+
     def _prepare_key(self, keyname):
         '''
         Aerospike supports multiple types of keynames:
@@ -453,6 +924,123 @@ class AS2Base(Base):
             self._ev2citrusleaf_obj_type,
             obj, self.ev2citrusleaf_object_set_null)
 
+    def _prepare_bins(self, bin_names_to_values):
+        '''
+        Return a (pooled) ev2citrusleaf_bin array filled from a mapping of
+        bin names to values, the number of bins used and the buffers the
+        bins point into (hold on to them until the request completes).
+        '''
+        num_bins = len(bin_names_to_values)
+        bins = self._checkout_bin_array(num_bins)
+        buffers = []
+        try:
+            for index, (key, value) in \
+                    enumerate(bin_names_to_values.items()):
+                if isinstance(value, six.string_types) and \
+                        not isinstance(value, bytes):
+                    try:
+                        value = value.encode('utf8')
+                    except UnicodeEncodeError:
+                        raise UnicodeEncodeError(
+                            ("Unable to convert value for bin "
+                             "key {0} to bytes!").format(key))
+                # The whole name, padding included, is copied over so
+                # nothing is left of what a reused array held before.
+                bins[index].bin_name = self._bin_names.get(key)
+                try:
+                    init_func = self.bin_init_funcs[type(value)]
+                except KeyError:
+                    raise ValueError(
+                        "Unsupported type {0} for value of key {1}".format(
+                            type(value), key))
+                buffer = init_func(
+                    self.ffi.addressof(bins[index].object), value)
+                if buffer is not None:
+                    buffers.append(buffer)
+        except Exception:
+            self._checkin_bin_array(bins)
+            raise
+        return bins, num_bins, buffers
+
+    def _projection(self, bin_names):
+        '''
+        Return the (cached) AS2Projection for a sequence of bin names.
+        '''
+        if isinstance(bin_names, (six.binary_type, six.text_type)):
+            bin_names = (bin_names,)
+        if not bin_names:
+            raise ValueError("No bins to select!")
+        return self._projections.get(tuple(bin_names))
+
+    def _encode_name(self, name):
+        '''
+        Return a char[] for a namespace, set or bin name
+        (see self._names).
+        '''
+        if not isinstance(name, six.binary_type):
+            name = name.encode('utf8')
+        return self.ffi.new('char[]', name)
+
+    def _encode_bin_name(self, key):
+        '''
+        Return a bin name as a zero padded ev2citrusleaf_bin_name, ready
+        to be copied into an ev2citrusleaf_bin (see self._bin_names).
+        '''
+        if isinstance(key, six.string_types) and \
+                not isinstance(key, bytes):
+            try:
+                key = key.encode('utf8')
+            except UnicodeEncodeError:
+                raise UnicodeEncodeError(
+                    ("Unable to convert key for bin "
+                     "key {0} to bytes!").format(key))
+        size_of_bin_name = self.ffi.sizeof('ev2citrusleaf_bin_name') - 1
+        if len(key) > size_of_bin_name:
+            raise ValueError(
+                "{0} too large a bin name to fit into {1} bytes!".format(
+                    key, size_of_bin_name))
+        if not key:
+            raise ValueError("Empty bin name!")
+        return self.ffi.new('ev2citrusleaf_bin_name', key)
+
+    def _checkout_bin_array(self, num_bins):
+        '''
+        Bin arrays come out of the generic_pool in size classes
+        (see BIN_ARRAY_SIZE_CLASSES), the smallest that fits num_bins.
+        '''
+        size_class = 1 << (num_bins - 1).bit_length()
+        if size_class > constants.BIN_ARRAY_SIZE_CLASSES[-1]:
+            return self.ffi.new('ev2citrusleaf_bin[]', num_bins)
+        bins_type = self._bin_array_types[size_class]
+        return self.generic_pool.checkout(
+            bins_type, self.ffi.new, (bins_type,))
+
+    def _reset_bin_array(self, bins):
+        '''
+        Free whatever the used bins own and mark them unused again.
+        Bins are used from the front and a used bin always has a name,
+        so stop at the first without one.
+        '''
+        for item in bins:
+            if item.bin_name[0] == b'\0':
+                break
+            item.bin_name[0] = b'\0'
+            obj = self.ffi.addressof(item.object)
+            self.ev2citrusleaf_object_free(obj)
+            self.ev2citrusleaf_object_set_null(obj)
+
+    def _checkin_bin_array(self, bins):
+        # Always reset, what the bins own must be freed even if the pool
+        # has no room for the array.
+        self._reset_bin_array(bins)
+        bins_type = self.ffi.typeof(bins)
+        if bins_type is self._ev2citrusleaf_bins_type:
+            # too large to pool
+            return
+        assert bins_type in self._bin_array_types.values(), \
+            CHECKIN_OBJ_FAILURE.format('ev2citrusleaf_bin[]')
+        self.generic_pool.checkin(bins_type, bins)
+
     def _generate_digest_container(self):
         return self.ffi.new('cf_digest *')
 
@@ -467,6 +1055,235 @@ class AS2Base(Base):
         return self.generic_pool.checkout(
             self._ev2citrusleaf_digest_type, self._generate_digest_container)
 
+    def _checkout_digest(self, digest):
+        '''
+        Return a pooled cf_digest * holding digest (a Digest or its
+        20 bytes).
+        '''
+        raw = getattr(digest, 'raw', digest)
+        if len(raw) != Digest.SIZE:
+            raise ValueError("Invalid Digest!")
+        digest_container = self._checkout_digest_container()
+        self.ffi.memmove(digest_container, raw, Digest.SIZE)
+        return digest_container
+
+    def _key_digest_array(self, keyset, key_identifiers):
+        '''
+        Return a cf_digest[] of the digests of key_identifiers in keyset,
+        calculated straight into the array. Keys bring their own (cached)
+        digest and set.
+        '''
+        digests_ptr = self.ffi.new('cf_digest[]', len(key_identifiers))
+        self._calculate_digests_into(keyset, key_identifiers, digests_ptr)
+        return digests_ptr
+
+    def _calculate_digests_into(self, keyset, key_identifiers, digests_ptr):
+        '''
+        Fill digests_ptr (cf_digest *) with the digests of
+        key_identifiers in keyset, one scratch ev2citrusleaf_object from
+        the pool for all of them.
+        '''
+        ffi = self.ffi
+        keyset_ptr = self._names.get(keyset)
+        # It only ever points at a copy of the key name (init_str) so
+        # there is nothing to free in between.
+        key_container = self._checkout_ev2citrusleaf_obj()
+        try:
+            for index, keyname in enumerate(key_identifiers):
+                digest_ptr = digests_ptr + index
+                if isinstance(keyname, Key):
+                    ffi.memmove(
+                        digest_ptr, self._prepared_key(keyname, True).digest,
+                        Digest.SIZE)
+                    continue
+                if isinstance(keyname, six.integer_types):
+                    self.ev2citrusleaf_object_init_int(
+                        key_container, keyname)
+                else:
+                    if isinstance(keyname, six.text_type):
+                        keyname = keyname.encode('utf8')
+                    elif not isinstance(keyname, six.binary_type):
+                        raise ValueError(
+                            ("Unsupported key type! "
+                             "Must be a numeric, unicode string or bytes!"))
+                    key_buffer = ffi.new('char[]', keyname)
+                    self.ev2citrusleaf_object_init_str(
+                        key_container, key_buffer)
+                if self.ev2citrusleaf_calculate_digest(
+                        keyset_ptr, key_container, digest_ptr) == -1:
+                    raise ValueError("Unknown data type for key!")
+        finally:
+            self._checkin_ev2citrusleaf_obj(key_container)
+
+
+@inherit_docstrings
+class AS2BatchOperations(BatchOperations):
+    def __init__(self, *args, **kwargs):
+        self._handle_batch_callback = self.ffi.callback(
+            EV2GETMANYCALLBACK, self._handle_batch_callback)
+        self._handle_exists_callback = self.ffi.callback(
+            EV2GETMANYCALLBACK, self._handle_exists_callback)
+
+    def get_many_digests(self, callback, namespace, digests,
+                         timeout_ms=DEFAULT_TIMEOUT_MS, ordered=False):
+        digests = tuple(digests)
+        return self._get_many(
+            callback, namespace, digests, self.digests_to_array(digests),
+            timeout_ms, ordered)
+
+    def get_many_keys(self, callback, namespace, keyset, key_identifiers,
+                      timeout_ms=DEFAULT_TIMEOUT_MS, ordered=False):
+        key_identifiers = tuple(key_identifiers)
+        return self._get_many(
+            callback, namespace, key_identifiers,
+            self._key_digest_array(keyset, key_identifiers),
+            timeout_ms, ordered)
+
+    def _get_many(self, callback, namespace, requested, digests_ptr,
+                  timeout_ms, ordered):
+        if not requested:
+            raise ValueError("No keys or digests to get!")
+        if ordered:
+            callback = self._in_request_order(
+                callback, digests_ptr, len(requested))
+        return self._submit_call(
+            self._handle_batch_callback, self._expire_batch,
+            callback, [digests_ptr], None,
+            self.ev2citrusleaf_get_many_digest,
+            self._cluster, self._names.get(namespace),
+            digests_ptr, len(requested), self.ffi.NULL, 0, timeout_ms)
+
+    def exists_digests(self, callback, namespace, digests,
+                       timeout_ms=DEFAULT_TIMEOUT_MS):
+        digests = tuple(digests)
+        return self._exists_many(
+            callback, namespace, self.digests_to_array(digests), len(digests),
+            timeout_ms)
+
+    def exists_keys(self, callback, namespace, keyset, key_identifiers,
+                    timeout_ms=DEFAULT_TIMEOUT_MS):
+        key_identifiers = tuple(key_identifiers)
+        return self._exists_many(
+            callback, namespace,
+            self._key_digest_array(keyset, key_identifiers),
+            len(key_identifiers), timeout_ms)
+
+    def _exists_many(self, callback, namespace, digests_ptr, count,
+                     timeout_ms):
+        if not count:
+            raise ValueError("No keys or digests to check!")
+        positions = self._digest_positions(digests_ptr, count)
+
+        def as_bytearray(code, found):
+            exists = bytearray(count)
+            for digest in found:
+                for index in positions.get(digest, ()):
+                    exists[index] = 1
+            callback(code, exists)
+        return self._submit_call(
+            self._handle_exists_callback, self._expire_exists,
+            as_bytearray, [digests_ptr], None,
+            self.ev2citrusleaf_exists_many_digest,
+            self._cluster, self._names.get(namespace),
+            digests_ptr, count, timeout_ms)
+
+    def _digest_positions(self, digests_ptr, count):
+        '''
+        Return {digest bytes: [indexes into digests_ptr]}; the same digest
+        may be asked for more than once.
+        '''
+        buffer = self.ffi.buffer(digests_ptr)
+        size = self.ffi.sizeof('cf_digest')
+        positions = {}
+        for index in xrange(count):
+            positions.setdefault(
+                buffer[index * size:(index + 1) * size], []).append(index)
+        return positions
+
+    def _in_request_order(self, callback, digests_ptr, count):
+        '''
+        Wrap callback to get the records lined up with the request
+        (None for those not found) instead of in the order the cluster
+        answered in.
+        '''
+        positions = self._digest_positions(digests_ptr, count)
+
+        def in_request_order(code, records):
+            ordered = [None] * count
+            for digest, bins, generation, expiration in records:
+                for index in positions.get(digest, ()):
+                    ordered[index] = (bins, generation, expiration)
+            callback(code, ordered)
+        return in_request_order
+
+    def _expire_batch(self, work, code=error_codes.EV2CITRUSLEAF_FAIL_TIMEOUT):
+        '''Fail (time out) a batch that never got accepted.'''
+        AS2BatchOperations._handle_batch_callback(
+            self, code, self.ffi.NULL, 0, work.args[-2])
+
+    def _expire_exists(self, work,
+                       code=error_codes.EV2CITRUSLEAF_FAIL_TIMEOUT):
+        '''Fail (time out) an existence check that never got accepted.'''
+        AS2BatchOperations._handle_exists_callback(
+            self, code, self.ffi.NULL, 0, work.args[-2])
+
+    def _handle_exists_callback(self, return_value, recs_ptr, n_recs,
+                                udata_ptr):
+        '''
+        Hand the digests found to the callback, no bins to decode
+        (or free) here.
+        '''
+        callback, refs_to_hold = self._async_complete(udata_ptr)
+        code = None
+        found = []
+        try:
+            if return_value != error_codes.EV2CITRUSLEAF_OK:
+                code = \
+                    (return_value,
+                     error_codes.aerospike_2_non_blocking_format_error(
+                         return_value),)
+            buffer, addressof = self.ffi.buffer, self.ffi.addressof
+            for rec in (recs_ptr[index] for index in xrange(n_recs)):
+                if rec.result == error_codes.EV2CITRUSLEAF_OK:
+                    found.append(buffer(addressof(rec, 'digest'))[:])
+        except Exception:
+            logger.exception(
+                "Unexpected exception in _handle_exists_callback! Fix it!")
+        finally:
+            callback(code, found)
+
+    def _handle_batch_callback(self, return_value, recs_ptr, n_recs,
+                               udata_ptr):
+        callback, refs_to_hold = self._async_complete(udata_ptr)
+        code = None
+        records = []
+        try:
+            if return_value != error_codes.EV2CITRUSLEAF_OK:
+                code = \
+                    (return_value,
+                     error_codes.aerospike_2_non_blocking_format_error(
+                         return_value),)
+            buffer = self.ffi.buffer
+            for rec in (recs_ptr[index] for index in xrange(n_recs)):
+                if rec.result != error_codes.EV2CITRUSLEAF_OK:
+                    continue
+                records.append((
+                    buffer(self.ffi.addressof(rec, 'digest'))[:],
+                    self._decode_bins(
+                        rec.bins, rec.n_bins, None,
+                        rec.generation, rec.expiration),
+                    rec.generation, rec.expiration))
+        except Exception:
+            logger.exception(
+                "Unexpected exception in _handle_batch_callback! Fix it!")
+        finally:
+            callback(code, records)
+            # The client frees recs and the bins arrays, their objects
+            # are ours.
+            for rec in (recs_ptr[index] for index in xrange(n_recs)):
+                if rec.n_bins:
+                    self.ev2citrusleaf_bins_free(rec.bins, rec.n_bins)
+
 
 @inherit_docstrings
 class AS2Info(InfoOperations):
@@ -475,10 +1292,13 @@ class AS2Info(InfoOperations):
             ("void (*) (int return_value, char *response, "
              "size_t response_len, void *udata)"), self._info_cb)
 
+    def _expire_info(self, work, code=error_codes.EV2CITRUSLEAF_FAIL_TIMEOUT):
+        '''Fail (time out) an info call that never got accepted.'''
+        callback, refs_to_hold = self._async_complete(work.args[-1])
+        callback(code, b'')
+
     def _info_cb(self, return_value, response_bytes, length, user_data):
-        uid_cast = self.ffi.cast('char *', user_data)
-        id = self.ffi.string(uid_cast)
-        callback, refs_to_hold = self._async_complete(id)
+        callback, refs_to_hold = self._async_complete(user_data)
         try:
             callback(
                 return_value,
@@ -493,23 +1313,31 @@ class AS2Info(InfoOperations):
                 hostname = tuple(self._hosts)[0]
             except IndexError:
                 raise ValueError("No hosts connected.")
-        cuid = self._async_checkin(
-            callback, ())
-        self._submit_work(
+        # The cluster's DNS base belongs to the first event loop,
+        # so info calls always run there.
+        event_loop = self._event_loops[0]
+        try:
+            cuid = self._async_checkin(
+                callback, (), event_loop.index, timeout_ms)
+        except BackpressureError:
+            if self._backpressure_policy == BACKPRESSURE_WOULD_BLOCK:
+                return WOULD_BLOCK
+            raise
+        self._submit_work_item(event_loop, WorkItem(
             self.ev2citrusleaf_info,
-            self._event_loop, self._cluster.dns_base,
-            hostname[0], hostname[1], self.ffi.NULL, timeout_ms,
-            self._info_cb, cuid)
+            (event_loop.base, self._cluster.dns_base,
+             hostname[0], hostname[1], self.ffi.NULL, timeout_ms,
+             self._info_cb, cuid),
+            clock() + timeout_ms / 1000.0, self._expire_info))
 
 
 @inherit_docstrings
 class AS2Digest(Digest):
-    def __init__(self, *uint8_ts):
-        assert len(self) == 20, "Invalid Digest!"
+    __slots__ = ()
 
     def encode_container(self, container):
-        for index, value in enumerate(self):
-            container.digest[index] = value
+        # one copy of all 20 bytes
+        container.digest = self.raw
         return container
 
 
@@ -522,38 +1350,130 @@ class AS2DigestOperations(DigestOperations):
             ev2citrusleaf_cluster *cl, char *ns, cf_digest *d, int timeout_ms,
             ev2citrusleaf_callback cb, void *udata, struct event_base *base)
         '''
-        if not isinstance(namespace, six.binary_type):
-            namespace = namespace.encode('utf8')
-        digest_container = self._checkout_digest_container()
-        digest.encode_container(digest_container)
+        if self._coalesce_reads:
+            return self._coalesce(
+                self._digest_read_key(namespace, digest),
+                self._get_digest, callback,
+                namespace, digest, timeout_ms)
+        return self._get_digest(callback, namespace, digest, timeout_ms)
 
-        cuid = self._async_checkin(
-            callback,
-            [digest_container, digest])
+    def _get_digest(self, callback, namespace, digest, timeout_ms):
+        namespace_ptr = self._names.get(namespace)
+        digest_container = self._checkout_digest(digest)
 
-        self._submit_work(
+        return self._submit_request(
+            callback,
+            [digest_container, digest], digest,
             self.ev2citrusleaf_get_all_digest,
-            self._cluster, namespace, digest_container, timeout_ms,
-            self._handle_event_callback, cuid, self._event_loop)
+            self._cluster, namespace_ptr, digest_container, timeout_ms)
+
+    def select_digest(self, callback, namespace, digest, bin_names,
+                      timeout_ms=DEFAULT_TIMEOUT_MS):
+        '''Get only bin_names of that digest.
+        int ev2citrusleaf_get_digest(
+            ev2citrusleaf_cluster *cl, char *ns, cf_digest *d,
+            const char **bins, int n_bins, int timeout_ms,
+            ev2citrusleaf_callback cb, void *udata, struct event_base *base)
+        '''
+        projection = self._projection(bin_names)
+        namespace_ptr = self._names.get(namespace)
+        digest_container = self._checkout_digest(digest)
+        return self._submit_call(
+            self._handle_projection_callback, self._expire_request,
+            callback, [digest_container, projection], digest,
+            self.ev2citrusleaf_get_digest,
+            self._cluster, namespace_ptr, digest_container,
+            projection.array, len(projection), timeout_ms)
+
+    def put_digest(self, callback, namespace, digest, write_parameters=None,
+                   timeout_ms=DEFAULT_TIMEOUT_MS, **bin_names_to_values):
+        '''
+        int ev2citrusleaf_put_digest(
+            ev2citrusleaf_cluster *cl, char *ns, cf_digest *d,
+            ev2citrusleaf_bin *bins, int n_bins,
+            ev2citrusleaf_write_parameters *wparam, int timeout_ms,
+            ev2citrusleaf_callback cb, void *udata, struct event_base *base)
+        '''
+        if not bin_names_to_values:
+            raise ValueError("No bins detected!")
+        namespace_ptr = self._names.get(namespace)
+        bins, num_bins, buffers = self._prepare_bins(bin_names_to_values)
+        digest_container = self._checkout_digest(digest)
+        write_parameters_ptr = \
+            self._checkout_write_parameters(write_parameters)
+        return self._submit_request(
+            self._after_write(
+                self._digest_read_key(namespace, digest), callback),
+            (digest_container, bins, write_parameters_ptr, buffers),
+            digest,
+            self.ev2citrusleaf_put_digest,
+            self._cluster, namespace_ptr, digest_container,
+            bins, num_bins, write_parameters_ptr, timeout_ms)
 
     def calculate_digest(self, keyset, keyname):
         '''Return the digest hash (bytes) for a key name.
         Useful for long keys, as we can send 20 bytes instead of a very
         long key name.
         '''
-        if not isinstance(keyset, six.binary_type):
-            keyset = keyset.encode('utf8')
+        keyset_ptr = self._names.get(keyset)
         key_container = self._prepare_key(keyname)
         digest_container = self._checkout_digest_container()
         try:
             if (self.ev2citrusleaf_calculate_digest(
-                    keyset, key_container, digest_container)) == -1:
+                    keyset_ptr, key_container, digest_container)) == -1:
                 raise ValueError("Unknown data type for key!")
-            return AS2Digest(digest_container.digest[i] for i in xrange(20))
+            return AS2Digest(self.ffi.buffer(digest_container)[:])
         finally:
             self._checkin_digest_container(digest_container)
             self._checkin_ev2citrusleaf_obj(key_container)
 
+    def digests_to_array(self, digests):
+        '''
+        Return a cf_digest[] holding digests (Digests or 20 bytes each),
+        filled with a single copy.
+        '''
+        raw = b''.join(getattr(digest, 'raw', digest) for digest in digests)
+        if len(raw) != len(digests) * Digest.SIZE:
+            raise ValueError("Invalid Digest!")
+        digests_ptr = self.ffi.new('cf_digest[]', len(digests))
+        self.ffi.memmove(digests_ptr, raw, len(raw))
+        return digests_ptr
+
+    def digests_from_array(self, digests_ptr, count=None):
+        '''
+        Return the AS2Digests in a cf_digest[], copied out in one go.
+        '''
+        if count is None:
+            count = len(digests_ptr)
+        raw = self.ffi.buffer(digests_ptr, count * Digest.SIZE)[:]
+        return [AS2Digest(raw[offset:offset + Digest.SIZE])
+                for offset in xrange(0, len(raw), Digest.SIZE)]
+
+    def calculate_digests(self, keyset, keys, pure_python=False):
+        '''
+        Return the digests of keys in keyset, one after the other in a
+        bytearray of len(keys) * 20 bytes; a (len(keys), 20) uint8 array
+        if keys is a NumPy array.
+
+        The digests are calculated straight into the result. pure_python
+        uses aerospike.digests instead of the C library.
+        '''
+        if pure_python:
+            return python_digests.calculate_digests(keyset, keys)
+        is_array = python_digests.numpy is not None and \
+            isinstance(keys, python_digests.numpy.ndarray)
+        if is_array:
+            keys = keys.tolist()
+            result = python_digests.numpy.empty(
+                (len(keys), Digest.SIZE), python_digests.numpy.uint8)
+        else:
+            result = bytearray(len(keys) * Digest.SIZE)
+        if keys:
+            self._calculate_digests_into(
+                keyset, keys,
+                self.ffi.cast('cf_digest *', self.ffi.from_buffer(result)))
+        return result
+
     def remove_digest(self, callback, namespace, digest_identifier,
                       timeout_ms=DEFAULT_TIMEOUT_MS, write_parameters=None):
         '''
@@ -564,24 +1484,25 @@ class AS2DigestOperations(DigestOperations):
             ev2citrusleaf_callback cb, void *udata,
             struct event_base *base);
         '''
-        if not isinstance(namespace, six.binary_type):
-            namespace = namespace.encode('utf8')
-        digest_container = digest_identifier.encode_container(
-            self._checkout_digest_container())
+        namespace_ptr = self._names.get(namespace)
+        digest_container = self._checkout_digest(digest_identifier)
         write_params = self._checkout_write_parameters(write_parameters)
-        cuid = self._async_checkin(
-            callback, [digest_container, write_params])
-        self._submit_work(
+        return self._submit_request(
+            self._after_write(
+                self._digest_read_key(namespace, digest_identifier),
+                callback),
+            [digest_container, write_params], digest_identifier,
             self.ev2citrusleaf_delete_digest,
-            self._cluster, namespace, digest_container,
-            write_params, timeout_ms, self._handle_event_callback, cuid,
-            self._event_loop)
+            self._cluster, namespace_ptr, digest_container,
+            write_params, timeout_ms)
 
 
 register(AS2DigestOperations, *VERSION)
+register(AS2BatchOperations, *VERSION)
 register(AS2Info, *VERSION)
 register(AS2Constructor, *VERSION)
 register(LibEvent, *VERSION)
 register(AS2CommonOperations, *VERSION)
 register(AS2KeyOperations, *VERSION)
+register(AS2OperatorOperations, *VERSION)
 register(AS2Base, *VERSION)
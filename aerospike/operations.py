@@ -41,16 +41,19 @@ class CommonOperations(UnimplementedOperation):
 class KeyOperations(UnimplementedOperation):
     @requires(2, 3)
     def get_key(
-            self, callback, namespace, keyset,
-            key_identifier, timeout_ms=DEFAULT_TIMEOUT_MS):
+            self, callback, namespace, keyset=None,
+            key_identifier=None, timeout_ms=DEFAULT_TIMEOUT_MS):
         '''
         Get all bins associated with this key.
+
+        namespace may be a Key instead, standing in for keyset and
+        key_identifier too: get_key(callback, key, timeout_ms).
         '''
         raise NotImplementedError
 
     @requires(2, 3)
-    def put_key(self, callback, namespace, keyset,
-                key_identifier, write_parameters=None,
+    def put_key(self, callback, namespace, keyset=None,
+                key_identifier=None, write_parameters=None,
                 timeout_ms=DEFAULT_TIMEOUT_MS, **bin_names_to_values):
         '''Put the **bin_names_to_values (like bin1='abc')
         into the desired key_identifier.
@@ -58,22 +61,39 @@ class KeyOperations(UnimplementedOperation):
         to sensible defaults.
 
         To delete a bin, set it's value to None.
+
+        namespace may be a Key instead, standing in for keyset and
+        key_identifier too: put_key(callback, key, write_parameters,
+        timeout_ms, **bin_names_to_values).
         '''
         raise NotImplementedError
 
     @requires(2, 3)
-    def remove_key(self, callback, namespace, keyset, key_identifier):
-        '''Delete the key'''
+    def remove_key(self, callback, namespace, keyset=None,
+                   key_identifier=None, write_parameters=None,
+                   timeout_ms=DEFAULT_TIMEOUT_MS):
+        '''
+        Delete the key.
+
+        namespace may be a Key instead, standing in for keyset and
+        key_identifier too: remove_key(callback, key, write_parameters,
+        timeout_ms).
+        '''
         raise NotImplementedError
 
     @requires(2, 3)
-    def select_key(self, callback, namespace, keyset, key_identifier,
-                   *named_bins_to_return):
+    def select_key(self, callback, namespace, keyset=None,
+                   key_identifier=None, bin_names=None,
+                   timeout_ms=DEFAULT_TIMEOUT_MS):
         '''
         Aerospike 3 allows you to fetch specific bins from a record instead
         of all of them like get_key would.
 
         Aerospike 2 left buried in the SDK the same ability.
+
+        namespace may be a Key instead, standing in for keyset and
+        key_identifier too: select_key(callback, key, bin_names,
+        timeout_ms).
         '''
         raise NotImplementedError
 
@@ -91,7 +111,7 @@ class KeyOperations(UnimplementedOperation):
 
 class OperatorOperations(UnimplementedOperation):
     @requires(2)
-    def key_pipeline(self, namespace, keyset, key_identifier,
+    def key_pipeline(self, namespace, keyset=None, key_identifier=None,
                      create_key_if_missing=False):
         '''
         Aerospike allows you to do a set of operations on a given key.
@@ -99,32 +119,58 @@ class OperatorOperations(UnimplementedOperation):
         Used for safe read-modify-write.
 
         if create_key_if_missing is True, the missing key will be initialized
-        with the first write operation.
+        with the first write operation. Aerospike 2 always does that and
+        raises ValueError for False.
 
         Returns an Aerospike KeyPipeline object that can be
         started with 'execute'
+
+        namespace may be a Key instead, standing in for keyset and
+        key_identifier too: key_pipeline(key, create_key_if_missing).
         '''
         raise NotImplementedError
 
 
 class BatchOperations(UnimplementedOperation):
     @requires(2)
-    def get_many_digests(self, callback, namespace, keyset, *digests):
+    def get_many_digests(self, callback, namespace, digests,
+                         timeout_ms=DEFAULT_TIMEOUT_MS, ordered=False):
+        '''
+        Fetch a list of digests (hashes for keys) in arospike, in one
+        request.
+
+        Expects callback of form: f(error_code, records), records being
+        (digest bytes, bins, generation, expiration) for every record found,
+        in no particular order. With ordered=True records lines up with
+        digests instead and holds (bins, generation, expiration), or None
+        for a record not found.
         '''
-        Fetch a list of digests (hashes for keys) in arospike.
+        raise NotImplementedError
 
-        Grants many records
+    @requires(2, 3)
+    def get_many_keys(self, callback, namespace, keyset, key_identifiers,
+                      timeout_ms=DEFAULT_TIMEOUT_MS, ordered=False):
+        '''
+        Like get_many_digests, except it operates on key names
+        (or Keys).
         '''
         raise NotImplementedError
 
     @requires(2, 3)
-    def get_many_keys(self, callback, namespace, keyset, *key_identifiers):
-        '''Like get_many_digests, except it operates on key names.'''
+    def exists_keys(self, callback, namespace, keyset, key_identifiers,
+                    timeout_ms=DEFAULT_TIMEOUT_MS):
+        '''
+        Test if many keys (or Keys) exist in the cluster.
+
+        Expects callback of form: f(error_code, exists), exists being a
+        bytearray lined up with key_identifiers, 1 where the record exists.
+        '''
         raise NotImplementedError
 
-    @requires(3)
-    def exists_keys(self, callback, namespace, keyset, *key_identifiers):
-        '''Test if many keys exist in the cluster'''
+    @requires(2)
+    def exists_digests(self, callback, namespace, digests,
+                       timeout_ms=DEFAULT_TIMEOUT_MS):
+        '''Like exists_keys, except it operates on digests.'''
         raise NotImplementedError
 
 
@@ -185,6 +231,19 @@ class DigestOperations(UnimplementedOperation):
         '''Get bins for that digest.'''
         raise NotImplementedError
 
+    @requires(2)
+    def select_digest(self, callback, namespace, digest_identifier,
+                      bin_names, timeout_ms=DEFAULT_TIMEOUT_MS):
+        '''Get only the bins named in bin_names for that digest.'''
+        raise NotImplementedError
+
+    @requires(2)
+    def put_digest(self, callback, namespace, digest_identifier,
+                   write_parameters=None, timeout_ms=DEFAULT_TIMEOUT_MS,
+                   **bin_names_to_values):
+        '''Like put_key, addressing the record by its digest.'''
+        raise NotImplementedError
+
     @requires(2)
     def calculate_digest(self, keyset, keyname):
         '''Return the digest hash for a key name. Useful for long keys, as
@@ -192,6 +251,30 @@ class DigestOperations(UnimplementedOperation):
         '''
         raise NotImplementedError
 
+    @requires(2)
+    def calculate_digests(self, keyset, keys, pure_python=False):
+        '''
+        Return the digests of many key names at once, as one buffer of
+        len(keys) * 20 bytes (or a (len(keys), 20) array for NumPy keys).
+        '''
+        raise NotImplementedError
+
+    @requires(2)
+    def digests_to_array(self, digests):
+        '''
+        Return digests (Digests or their 20 bytes) packed into one
+        contiguous C array of digests, as the batch calls take them.
+        '''
+        raise NotImplementedError
+
+    @requires(2)
+    def digests_from_array(self, digests_ptr, count=None):
+        '''
+        Return a list of the Digests in a C array of digests (the first
+        count of them, if given).
+        '''
+        raise NotImplementedError
+
     @requires(2)
     def remove_digest(self, callback, namespace, digest_identifier,
                       timeout_ms=DEFAULT_TIMEOUT_MS, write_parameters=None):
@@ -1,22 +1,139 @@
 import sys
+import os
+import re
+import json
 from ctypes.util import find_library
 from .constants import (DEPENDENCY, NONBLOCKING, BLOCKING,
                         AEROSPIKE_3, AEROSPIKE_2,)
 
+# name -> path of a shared library, consulted before anything else.
+# AEROSPIKE_LIBRARY_<NAME> environment variables (name upper cased,
+# anything not alphanumeric turned into '_', e.g.
+# AEROSPIKE_LIBRARY_EV2CITRUSLEAF_2_0) work the same way.
+LIBRARY_PATHS = {}
+LIBRARY_ENV_PREFIX = 'AEROSPIKE_LIBRARY_'
+# Where resolved libraries are remembered between processes.
+LIBRARY_CACHE_ENV = 'AEROSPIKE_LIBRARY_CACHE'
+# On Linux find_library answers with a soname out of `ldconfig -p`, which
+# only changes when this does.
+LD_SO_CACHE = '/etc/ld.so.cache'
+
+
+def library_override(name):
+    if name in LIBRARY_PATHS:
+        return LIBRARY_PATHS[name]
+    return os.environ.get(
+        LIBRARY_ENV_PREFIX + re.sub('[^A-Z0-9]', '_', name.upper()))
+
+
+def library_stamp(path):
+    '''
+    Return the mtime find_library's answer for a library depends upon:
+    the library itself if we got a path, otherwise (a soname, or not found
+    at all) the linker cache. None if there is nothing to go by.
+    '''
+    if path is None or not os.path.isabs(path):
+        path = LD_SO_CACHE
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class LibraryCache(object):
+    '''
+    Results of find_library kept on disk, so short lived processes don't
+    each fork ldconfig (and maybe gcc) to rediscover the same libraries.
+
+    An entry is only trusted while the mtime it was stored with
+    (see library_stamp) still matches.
+    '''
+    def __init__(self, filename=None):
+        self.filename = filename or self.default_filename()
+        self._entries = None
+
+    @staticmethod
+    def default_filename():
+        if os.environ.get(LIBRARY_CACHE_ENV):
+            return os.environ[LIBRARY_CACHE_ENV]
+        cache_home = os.environ.get('XDG_CACHE_HOME') or \
+            os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(cache_home, 'aerospike', 'libraries.json')
+
+    @staticmethod
+    def key(name):
+        # find_library also searches LD_LIBRARY_PATH
+        return '{0}:{1}:{2}'.format(
+            sys.platform, os.environ.get('LD_LIBRARY_PATH', ''), name)
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            try:
+                with open(self.filename, 'r') as fh:
+                    self._entries = json.load(fh)
+            except (IOError, OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def get(self, name):
+        '''
+        Return (True, path) for a cached result still valid, path being None
+        if the library wasn't found. (False, None) otherwise.
+        '''
+        entry = self.entries.get(self.key(name))
+        if entry is not None and entry['stamp'] is not None and \
+                entry['stamp'] == library_stamp(entry['path']):
+            return True, entry['path']
+        return False, None
+
+    def set(self, name, path):
+        stamp = library_stamp(path)
+        if stamp is None:
+            return
+        self.entries[self.key(name)] = {'path': path, 'stamp': stamp}
+        # Write and rename, so a concurrent reader never sees half a file.
+        # A cache we can't write is just a cache miss next time.
+        temporary = '{0}.{1}'.format(self.filename, os.getpid())
+        try:
+            if not os.path.isdir(os.path.dirname(self.filename)):
+                os.makedirs(os.path.dirname(self.filename))
+            with open(temporary, 'w') as fh:
+                json.dump(self.entries, fh)
+            os.rename(temporary, self.filename)
+        except (IOError, OSError):
+            pass
+
+library_cache = LibraryCache()
+
+
+def locate_library(name):
+    path = library_override(name)
+    if path:
+        return path
+    cached, path = library_cache.get(name)
+    if not cached:
+        path = find_library(name)
+        library_cache.set(name, path)
+    return path
+
 
 class SharedLibrary(object):
     def __init__(self, *names):
         self.names = names
+        self._path = None
 
     def __str__(self):
         return 'SharedLibrary({0})'.format(', '.join(self.names))
 
     def find_library(self):
-        for name in self.names:
-            dependency = find_library(name)
-            if dependency:
-                return dependency
-        return None
+        if self._path is None:
+            for name in self.names:
+                dependency = locate_library(name)
+                if dependency:
+                    self._path = dependency
+                    break
+        return self._path
 
 LIBRARY_TYPES = {
     AEROSPIKE_3: [
@@ -38,6 +155,10 @@ def detect_aerospike_libraries(aerospike_version=None):
     followed by the higher ranked type (i.e. if a NONBLOCKING is
         found, it will win over BLOCKING)
 
+    Paths can be forced with LIBRARY_PATHS or AEROSPIKE_LIBRARY_<NAME>
+    environment variables; anything else is looked up in (and remembered
+    by) library_cache before falling back to find_library.
+
     This function does not depend upon anything and thus is safe to
     call from setup.py.
     """
@@ -3,6 +3,7 @@
 from setuptools import (setup, find_packages)
 # Always prefer setuptools over distutils
 from codecs import open  # To use a consistent encoding
+import os
 from os import path
 from aerospike.utils import detect_aerospike_libraries
 
@@ -18,6 +19,18 @@ has_aerospike_libraries = detect_aerospike_libraries()
 if not has_aerospike_libraries:
     raise ValueError("cannot locate aerospike shared libraries!")
 
+setup_options = {}
+try:
+    import cffi  # noqa
+except ImportError:
+    pass
+else:
+    # Optional: precompile the cffi declarations (aerospike._as2nb) so
+    # import doesn't have to parse as2nb.h. Without it the library
+    # falls back to parsing at runtime.
+    if not os.environ.get('AEROSPIKE_NO_PRECOMPILED_FFI'):
+        setup_options['cffi_modules'] = ['aerospike/build_ffi.py:ffibuilder']
+
 setup(
     name="aerospike",
 
@@ -87,4 +100,5 @@ setup(
             'aerospike-cli=aerospike:setup_cli'
         ],
     },
+    **setup_options
 )
@@ -0,0 +1,86 @@
+'Test the completion dispatchers, no server needed'
+import unittest
+import threading
+import asyncio
+from aerospike.aio import AsyncioClient
+from aerospike.completion import (
+    InlineDispatcher, ThreadPoolDispatcher, QueueDispatcher)
+
+
+class TestInlineDispatcher(unittest.TestCase):
+    def test_wrap(self):
+        callback = lambda *args: None
+        self.assertIs(InlineDispatcher().wrap(callback), callback)
+
+
+class TestThreadPoolDispatcher(unittest.TestCase):
+    def test_runs_on_workers(self):
+        dispatcher = ThreadPoolDispatcher(2)
+        threads = []
+        done = threading.Event()
+
+        def callback(code, bins):
+            threads.append((threading.current_thread(), code, bins))
+            done.set()
+        dispatcher.wrap(callback)(None, {b'a': 1})
+        self.assertTrue(done.wait(5))
+        dispatcher.shutdown()
+        thread, code, bins = threads[0]
+        self.assertIsNot(thread, threading.current_thread())
+        self.assertEqual((code, bins), (None, {b'a': 1}))
+
+    def test_shutdown_runs_queued(self):
+        dispatcher = ThreadPoolDispatcher(1)
+        results = []
+        for index in range(100):
+            dispatcher.wrap(results.append)(index)
+        dispatcher.shutdown()
+        self.assertEqual(sorted(results), list(range(100)))
+
+    def test_survives_exceptions(self):
+        dispatcher = ThreadPoolDispatcher(1)
+        results = []
+        dispatcher.wrap(lambda: 1 / 0)()
+        dispatcher.wrap(results.append)(1)
+        dispatcher.shutdown()
+        self.assertEqual(results, [1])
+
+
+class TestQueueDispatcher(unittest.TestCase):
+    def test_drain(self):
+        dispatcher = QueueDispatcher()
+        results = []
+        for index in range(10):
+            dispatcher.wrap(results.append)(index)
+        self.assertEqual(results, [])
+        self.assertEqual(len(dispatcher), 10)
+        self.assertEqual(dispatcher.drain(max_callbacks=4), 4)
+        self.assertEqual(dispatcher.drain(), 6)
+        self.assertEqual(results, list(range(10)))
+        self.assertEqual(dispatcher.drain(), 0)
+
+    def test_drain_waits(self):
+        dispatcher = QueueDispatcher()
+        results = []
+        timer = threading.Timer(0.05, dispatcher.wrap(results.append), (1,))
+        timer.start()
+        self.assertEqual(dispatcher.drain(timeout=5), 1)
+        self.assertEqual(results, [1])
+        self.assertEqual(dispatcher.drain(timeout=0.01), 0)
+
+
+class TestAsyncioClient(unittest.TestCase):
+    def test_owned_values(self):
+        # results are looked at after the bins are freed
+        class Client(object):
+            _owned_values = False
+        loop = asyncio.new_event_loop()
+        try:
+            client = AsyncioClient(Client(), loop)
+        finally:
+            loop.close()
+        self.assertIs(client.client._owned_values, True)
+
+
+if __name__ == '__main__':
+    unittest.main()
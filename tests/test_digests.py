@@ -0,0 +1,91 @@
+'Test the Python digest calculation, no server needed'
+import unittest
+import struct
+import cffi
+from aerospike import constants, digests
+from aerospike.implementations_as2libevent import (
+    AS2Digest, AS2DigestOperations)
+
+
+class TestRipemd160(unittest.TestCase):
+    VECTORS = [
+        (b'', '9c1185a5c5e9fc54612808977ee8f548b2258d31'),
+        (b'abc', '8eb208f7e05d987a9b044a8e98c6b087f15a0bfc'),
+        (b'message digest', '5d0689ef49d2fae572b881b123a85ffa21595f36'),
+    ]
+
+    def test_vectors(self):
+        for data, expected in self.VECTORS:
+            self.assertEqual(
+                digests.ripemd160(data), bytearray.fromhex(expected))
+
+    def test_block_boundaries(self):
+        # padding spills into a second block from 56 bytes on
+        for length in (55, 56, 63, 64, 65):
+            data = b'x' * length
+            self.assertEqual(
+                digests.ripemd160(data), digests.digest_function(data))
+
+
+class TestKeyDigests(unittest.TestCase):
+    def test_key_bytes(self):
+        self.assertEqual(
+            digests.key_bytes(1), b'\x01' + struct.pack('>q', 1))
+        self.assertEqual(
+            digests.key_bytes(-1), b'\x01' + b'\xff' * 8)
+        self.assertEqual(digests.key_bytes(u'abc'), b'\x03abc')
+        self.assertEqual(digests.key_bytes(b'abc'), b'\x03abc')
+        self.assertRaises(ValueError, digests.key_bytes, 1.5)
+
+    def test_key_digest(self):
+        self.assertEqual(
+            digests.key_digest('set', 'key'),
+            digests.ripemd160(b'set\x03key'))
+
+    def test_calculate_digests(self):
+        keys = [1, 'two', b'three']
+        result = digests.calculate_digests('set', keys)
+        self.assertEqual(len(result), len(keys) * digests.DIGEST_SIZE)
+        for index, key in enumerate(keys):
+            offset = index * digests.DIGEST_SIZE
+            self.assertEqual(
+                bytes(result[offset:offset + digests.DIGEST_SIZE]),
+                digests.key_digest('set', key))
+
+    @unittest.skipIf(digests.numpy is None, 'numpy not installed')
+    def test_calculate_digests_numpy(self):
+        keys = digests.numpy.arange(10)
+        result = digests.calculate_digests('set', keys)
+        self.assertEqual(result.shape, (10, digests.DIGEST_SIZE))
+        self.assertEqual(
+            result[3].tobytes(), digests.key_digest('set', 3))
+
+
+class TestDigestArrays(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.ffi = cffi.FFI()
+        cls.ffi.cdef(
+            constants.DEFINES[constants.AEROSPIKE_2][constants.NONBLOCKING])
+
+    def test_round_trip(self):
+        # only the ffi is needed, not a connected client
+        client = AS2DigestOperations.__new__(AS2DigestOperations)
+        client.ffi = self.ffi
+        values = [
+            AS2Digest(digests.key_digest('set', key)) for key in range(5)]
+        array = client.digests_to_array(
+            values[:2] + [value.raw for value in values[2:]])
+        self.assertEqual(len(array), 5)
+        self.assertEqual(client.digests_from_array(array), values)
+        self.assertEqual(client.digests_from_array(array, 2), values[:2])
+        self.assertRaises(ValueError, client.digests_to_array, [b'short'])
+
+    def test_equality(self):
+        value = AS2Digest(digests.key_digest('set', 'key'))
+        self.assertEqual(value, AS2Digest(tuple(value)))
+        self.assertNotEqual(value, tuple(value))
+
+
+if __name__ == '__main__':
+    unittest.main()
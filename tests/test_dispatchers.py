@@ -0,0 +1,46 @@
+'Test handing work to the event loops, no server needed'
+import unittest
+from aerospike import error_codes
+from aerospike.dispatchers import LibEvent, EventLoop, WorkItem, clock
+
+
+class TestRunWork(unittest.TestCase):
+    def setUp(self):
+        # _run_work only needs the retry settings, not a running loop
+        self.dispatcher = LibEvent.__new__(LibEvent)
+        self.dispatcher._retry_backoff = 0.01
+        self.dispatcher._retry_backoff_max = 0.1
+        self.event_loop = EventLoop(0, None)
+        self.expired = []
+
+    def run_work(self, code, deadline=None):
+        work = WorkItem(
+            lambda: code, (), deadline,
+            lambda work, *code: self.expired.append((work, code)))
+        self.dispatcher._run_work(self.event_loop, work)
+        return work
+
+    def test_accepted(self):
+        self.run_work(0)
+        self.assertEqual(self.expired, [])
+        self.assertEqual(self.event_loop.retries.pending, 0)
+
+    def test_unexpected_code(self):
+        work = self.run_work(-99)
+        self.assertEqual(self.expired, [(work, (-99,))])
+        self.assertEqual(self.event_loop.retries.pending, 0)
+
+    def test_refused_retries(self):
+        self.run_work(error_codes.EV2CITRUSLEAF_FAIL_THROTTLED, clock() + 60)
+        self.assertEqual(self.expired, [])
+        self.assertEqual(self.event_loop.retries.pending, 1)
+
+    def test_refused_past_deadline(self):
+        work = self.run_work(
+            error_codes.EV2CITRUSLEAF_FAIL_CLIENT_ERROR, clock())
+        self.assertEqual(self.expired, [(work, ())])
+        self.assertEqual(self.event_loop.retries.pending, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+'Test decoding bins into Python values, no server needed'
+import unittest
+import cffi
+from aerospike import constants, filters
+
+
+class TestStringBins(unittest.TestCase):
+    VALUES = (b'', b'abc', b'ab\x00cd', b'\x00\x00')
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ffi = cffi.FFI()
+        cls.ffi.cdef(
+            constants.DEFINES[constants.AEROSPIKE_2][constants.NONBLOCKING])
+
+    def make_bins(self, values):
+        ffi = self.ffi
+        bins = ffi.new('ev2citrusleaf_bin[]', len(values))
+        # what the bins point into, laid out the way put_key writes bytes
+        buffers = []
+        for index, value in enumerate(values):
+            buffer = ffi.from_buffer(value)
+            buffers.append(buffer)
+            bins[index].bin_name = 'bin{0}'.format(index).encode('ascii')
+            bins[index].object.type = filters.CL_STR
+            bins[index].object.u.str = ffi.cast('char *', buffer)
+            bins[index].object.size = len(value)
+        return bins, buffers
+
+    def test_embedded_nul(self):
+        bins, buffers = self.make_bins(self.VALUES)
+        names, values = filters.decode_bins(bins, len(self.VALUES), self.ffi)
+        self.assertEqual(tuple(values), self.VALUES)
+        for index, value in enumerate(self.VALUES):
+            self.assertEqual(
+                filters.get_value(bins[index], filters.CL_STR, self.ffi),
+                value)
+
+
+if __name__ == '__main__':
+    unittest.main()
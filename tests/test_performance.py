@@ -0,0 +1,301 @@
+'Latency/throughput benchmarks against a local aerospike server'
+import unittest
+import aerospike
+import threading
+import time
+import cffi
+from six.moves import range as xrange
+from aerospike import constants, filters
+from aerospike.data_types import Record
+
+try:
+    timer = time.perf_counter
+except AttributeError:
+    timer = time.time
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = int(round((pct / 100.0) * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def report(name, samples):
+    print('{0}: n={1} p50={2:.1f}us p99={3:.1f}us'.format(
+        name, len(samples),
+        percentile(samples, 50) * 1e6, percentile(samples, 99) * 1e6))
+
+
+class TestSubmitLatency(unittest.TestCase):
+    '''
+    How long does a request sit in the dispatcher queue of an otherwise
+    idle event loop before the loop thread hands it to the C library?
+
+    Only reports the numbers; timings depend on the machine's load.
+    '''
+    SAMPLES = 20
+
+    def setUp(self):
+        self.client = aerospike.get_client()
+        self.client.add_host('127.0.0.1', 3000)
+
+    def tearDown(self):
+        self.client.shutdown()
+
+    def measure(self, wake_loop_on_submit):
+        self.client._wake_loop_on_submit = wake_loop_on_submit
+        samples = []
+        sent = threading.Event()
+        for _ in xrange(self.SAMPLES):
+            sent.clear()
+            stamp = {}
+
+            def send():
+                stamp['sent'] = timer()
+                sent.set()
+                return 0
+            # let the loop go idle again
+            time.sleep(0.01)
+            t_s = timer()
+            self.client._submit_work(self.client._route_event_loop(), send)
+            sent.wait()
+            samples.append(stamp['sent'] - t_s)
+        return samples
+
+    def test_idle_submit_to_send(self):
+        before = self.measure(wake_loop_on_submit=False)
+        after = self.measure(wake_loop_on_submit=True)
+        report('idle submit-to-send (polling)', before)
+        report('idle submit-to-send (wakeup)', after)
+
+
+class TestBlockingLatency(unittest.TestCase):
+    '''
+    A bl_ call should cost about the same as the async call it wraps
+    plus one thread wakeup.
+
+    Only reports the numbers; timings depend on the machine's load.
+    '''
+    SAMPLES = 200
+
+    def setUp(self):
+        self.client = aerospike.get_client()
+        self.client.add_host('127.0.0.1', 3000)
+        self.namespace = 'test'
+        self.keyset = 'Aerospike'
+        self.key = 'blocking-latency'
+        self.client.bl_put_key(
+            self.namespace, self.keyset, self.key, value=1)
+
+    def tearDown(self):
+        self.client.shutdown()
+
+    def test_blocking_vs_async(self):
+        async_samples = []
+        done = threading.Event()
+
+        def callback(*args):
+            async_samples.append(timer() - t_s)
+            done.set()
+
+        for _ in xrange(self.SAMPLES):
+            done.clear()
+            t_s = timer()
+            self.client.get_key(
+                callback, self.namespace, self.keyset, self.key)
+            done.wait()
+
+        blocking_samples = []
+        for _ in xrange(self.SAMPLES):
+            t_s = timer()
+            self.client.bl_get_key(self.namespace, self.keyset, self.key)
+            blocking_samples.append(timer() - t_s)
+
+        report('get_key (async)', async_samples)
+        report('bl_get_key', blocking_samples)
+
+
+class TestProjectedReads(unittest.TestCase):
+    '''
+    select_key of one small bin from a wide record against get_key of
+    the whole record.
+
+    Only reports the numbers; timings depend on the machine's load.
+    '''
+    SAMPLES = 200
+    WIDE_BINS = 32
+    BIN_SIZE = 4096
+
+    def setUp(self):
+        self.client = aerospike.get_client()
+        self.client.add_host('127.0.0.1', 3000)
+        self.namespace = 'test'
+        self.keyset = 'Aerospike'
+        self.key = 'projected-reads'
+        bins = dict(
+            ('wide{0}'.format(index), 'x' * self.BIN_SIZE)
+            for index in xrange(self.WIDE_BINS))
+        bins['flag'] = 1
+        self.client.bl_put_key(
+            self.namespace, self.keyset, self.key, **bins)
+
+    def tearDown(self):
+        self.client.shutdown()
+
+    def measure(self, function, *args, **kwargs):
+        samples = []
+        for _ in xrange(self.SAMPLES):
+            t_s = timer()
+            function(*args, **kwargs)
+            samples.append(timer() - t_s)
+        return samples
+
+    def test_select_vs_get(self):
+        get_samples = self.measure(
+            self.client.bl_get_key, self.namespace, self.keyset, self.key)
+        select_samples = self.measure(
+            self.client.bl_select_key, self.namespace, self.keyset,
+            self.key, ['flag'])
+        report('get_key (wide record)', get_samples)
+        report('select_key (one bin)', select_samples)
+
+
+class TestCoalescedReads(unittest.TestCase):
+    '''
+    A herd of identical get_key calls in flight at once, with and
+    without coalesce_reads.
+
+    Only reports the numbers; timings depend on the machine's load.
+    '''
+    HERD = 200
+    ROUNDS = 20
+
+    def setUp(self):
+        self.namespace = 'test'
+        self.keyset = 'Aerospike'
+        self.key = 'coalesced-reads'
+
+    def measure(self, coalesce_reads):
+        client = aerospike.get_client(coalesce_reads=coalesce_reads)
+        client.add_host('127.0.0.1', 3000)
+        client.bl_put_key(self.namespace, self.keyset, self.key, value=1)
+        samples = []
+        try:
+            for _ in xrange(self.ROUNDS):
+                done = threading.Event()
+                remaining = [self.HERD]
+                lock = threading.Lock()
+
+                def callback(*args):
+                    with lock:
+                        remaining[0] -= 1
+                        if not remaining[0]:
+                            done.set()
+                t_s = timer()
+                for _ in xrange(self.HERD):
+                    client.get_key(
+                        callback, self.namespace, self.keyset, self.key)
+                done.wait()
+                samples.append(timer() - t_s)
+        finally:
+            client.shutdown()
+        return samples
+
+    def test_herd(self):
+        before = self.measure(coalesce_reads=False)
+        after = self.measure(coalesce_reads=True)
+        report('get_key herd of {0}'.format(self.HERD), before)
+        report('get_key herd of {0} (coalesced)'.format(self.HERD), after)
+
+
+class TestDecodeBins(unittest.TestCase):
+    '''
+    Callback side decoding of a record, no server needed: the bins dict
+    built bin by bin through get_bin_name/get_value against a Record
+    made by one pass of decode_bins.
+
+    Runs with every plain test run, so it only reports the numbers and
+    checks both decodings agree; timings depend on the machine's load.
+    '''
+    SAMPLES = 2000
+    WIDTHS = (1, 10, 100)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ffi = cffi.FFI()
+        cls.ffi.cdef(
+            constants.DEFINES[constants.AEROSPIKE_2][constants.NONBLOCKING])
+        # keep the strings alive as long as the bins pointing at them
+        cls.strings = []
+
+    def make_bins(self, count):
+        bins = self.ffi.new('ev2citrusleaf_bin[]', count)
+        for index in xrange(count):
+            bins[index].bin_name = 'bin{0}'.format(index).encode('ascii')
+            if index % 2:
+                value = self.ffi.new('char[]', b'x' * 64)
+                self.strings.append(value)
+                bins[index].object.type = filters.CL_STR
+                bins[index].object.u.str = value
+                bins[index].object.size = 64
+            else:
+                bins[index].object.type = filters.CL_INT
+                bins[index].object.u.i64 = index
+        return bins
+
+    def decode_dict(self, bins_ptr, n_bins):
+        ffi = self.ffi
+        bins = {}
+        for bin in (bins_ptr[index] for index in xrange(n_bins)):
+            bins[filters.get_bin_name(bin, ffi)] = \
+                filters.get_value(bin, bin.object.type, ffi)
+        return bins
+
+    def decode_record(self, bins_ptr, n_bins):
+        names, values = filters.decode_bins(bins_ptr, n_bins, self.ffi)
+        return Record(tuple(names), tuple(values), 1, 0)
+
+    def measure(self, bins, n_bins):
+        # interleaved, so both see the same machine
+        dict_samples = []
+        record_samples = []
+        for _ in xrange(self.SAMPLES):
+            t_s = timer()
+            expected = self.decode_dict(bins, n_bins)
+            t_m = timer()
+            record = self.decode_record(bins, n_bins)
+            record_samples.append(timer() - t_m)
+            dict_samples.append(t_m - t_s)
+        self.assertEqual(record, expected)
+        return dict_samples, record_samples
+
+    def test_decode(self):
+        for width in self.WIDTHS:
+            dict_samples, record_samples = self.measure(
+                self.make_bins(width), width)
+            report('decode {0} bins (dict)'.format(width), dict_samples)
+            report('decode {0} bins (Record)'.format(width), record_samples)
+
+
+class TestClientStartup(unittest.TestCase):
+    '''
+    get_client() cold start; the bl_/t_ wrappers are built for the first
+    client only and shared by every client after it.
+    '''
+    SAMPLES = 20
+
+    def test_get_client(self):
+        samples = []
+        classes = set()
+        for _ in xrange(self.SAMPLES):
+            t_s = timer()
+            client = aerospike.get_client()
+            samples.append(timer() - t_s)
+            classes.add(type(client))
+            client.shutdown()
+        report('get_client()', samples)
+        self.assertEqual(len(classes), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
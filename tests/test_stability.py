@@ -1,11 +1,13 @@
 'Test the driver on a local aerospike server (usually via vagrant)'
 import unittest
 import aerospike
+from aerospike import error_codes
 from unittest.mock import Mock
 import string
 import random
 from six.moves import range as xrange
 from threading import Lock
+import threading
 import functools
 import time
 import six
@@ -125,5 +127,134 @@ Timeouts: {1}\nMissing keys: {2}".format(
 
 
 
+class TestKeys(unittest.TestCase):
+    '''
+    A Key stands in for namespace, keyset and key_identifier, whatever
+    follows it positionally is the next parameter along.
+    '''
+    def setUp(self):
+        self.client = aerospike.get_client()
+        self.client.add_host('127.0.0.1', 3000)
+        self.key = aerospike.Key('test', 'Aerospike', get_random_key(31))
+        error, _, _, _ = self.client.bl_put_key(
+            self.key, None, 1000, flag=1, other=b'x')
+        self.assertIsNone(error)
+
+    def tearDown(self):
+        self.client.bl_remove_key(self.key)
+        self.client.shutdown()
+
+    def test_select_key_positional(self):
+        error, bins, _, _ = self.client.bl_select_key(self.key, ['flag'])
+        self.assertIsNone(error)
+        self.assertEqual(bins, {b'flag': 1})
+        error, bins, _, _ = self.client.bl_select_key(
+            self.key, ['flag', 'other'], 1000)
+        self.assertIsNone(error)
+        self.assertEqual(bins, {b'flag': 1, b'other': b'x'})
+
+    def test_select_key_wide_record(self):
+        bins = dict(
+            ('wide{0}'.format(index), 'x' * 4096) for index in xrange(32))
+        error, _, _, _ = self.client.bl_put_key(self.key, None, 1000, **bins)
+        self.assertIsNone(error)
+        error, bins, _, _ = self.client.bl_get_key(self.key, 1000)
+        self.assertIsNone(error)
+        self.assertEqual(len(bins), 32 + 2)
+        error, bins, _, _ = self.client.bl_select_key(
+            self.key, ['flag'], 1000)
+        self.assertIsNone(error)
+        self.assertEqual(bins, {b'flag': 1})
+
+    def test_get_key_positional(self):
+        error, bins, _, _ = self.client.bl_get_key(self.key, 1000)
+        self.assertIsNone(error)
+        self.assertEqual(bins, {b'flag': 1, b'other': b'x'})
+
+    def test_blocking_matches_async(self):
+        done = threading.Event()
+        results = []
+
+        def callback(*args):
+            results.append(args)
+            done.set()
+        self.client.get_key(callback, self.key, 1000)
+        self.assertTrue(done.wait(5))
+        self.assertEqual(
+            self.client.bl_get_key(self.key, 1000), results[0])
+
+    def test_embedded_nul(self):
+        error, _, _, _ = self.client.bl_put_key(
+            self.key, None, 1000, other=b'ab\x00cd')
+        self.assertIsNone(error)
+        error, bins, _, _ = self.client.bl_get_key(self.key, 1000)
+        self.assertIsNone(error)
+        self.assertEqual(bins, {b'flag': 1, b'other': b'ab\x00cd'})
+
+    def execute(self, pipeline):
+        done = threading.Event()
+        results = []
+
+        def executed(*args):
+            results.append(args)
+            done.set()
+        pipeline.execute(executed, timeout_ms=1000)
+        self.assertTrue(done.wait(5))
+        return results[0]
+
+    def test_pipeline_missing_key(self):
+        missing = aerospike.Key('test', 'Aerospike', get_random_key(31))
+        error, _, _, _ = self.execute(
+            self.client.key_pipeline(missing).read('flag'))
+        self.assertEqual(error[0], error_codes.EV2CITRUSLEAF_FAIL_NOTFOUND)
+        error, _, _, _ = self.execute(
+            self.client.key_pipeline(missing).incr('flag'))
+        self.client.bl_remove_key(missing)
+        self.assertIsNone(error)
+
+    def test_too_many_arguments(self):
+        self.assertRaises(
+            TypeError, self.client.bl_get_key, self.key, 1000, 'extra')
+        self.assertRaises(
+            TypeError, self.client.bl_select_key, self.key, ['flag'],
+            1000, bin_names=['other'])
+
+
+class TestCoalescedReads(unittest.TestCase):
+    '''
+    Every get_key of a herd sharing one read in flight gets called back,
+    each with the record.
+    '''
+    HERD = 200
+
+    def setUp(self):
+        self.client = aerospike.get_client(coalesce_reads=True)
+        self.client.add_host('127.0.0.1', 3000)
+        self.key = aerospike.Key('test', 'Aerospike', get_random_key(31))
+        error, _, _, _ = self.client.bl_put_key(self.key, None, 1000, value=1)
+        self.assertIsNone(error)
+
+    def tearDown(self):
+        self.client.bl_remove_key(self.key)
+        self.client.shutdown()
+
+    def test_herd(self):
+        done = threading.Event()
+        results = []
+        lock = Lock()
+
+        def callback(*args):
+            with lock:
+                results.append(args)
+                if len(results) == self.HERD:
+                    done.set()
+        for _ in xrange(self.HERD):
+            self.client.get_key(callback, self.key, 1000)
+        self.assertTrue(done.wait(5))
+        self.assertEqual(len(results), self.HERD)
+        for error, bins, _, _ in results:
+            self.assertIsNone(error)
+            self.assertEqual(bins, {b'value': 1})
+
 if __name__ == '__main__':
     unittest.main()